@@ -0,0 +1,159 @@
+"""
+Adaptive Model Parameter Tuning
+
+Long generations hurt turn-taking: the longer the model is allowed to talk,
+the later the user gets the floor back. LatencyController records time to
+first audio and utterance length for every turn and, within operator-set
+bounds, caps max_output_tokens (and then asks for shorter answers) when the
+p95 latency goes over the target. It relaxes again once latency recovers.
+
+The Gemini live session only reads these limits when it connects, and a
+reconnect per adjustment would cost more latency than it saves. A decision is
+therefore held until the session is next rebuilt for another reason (a config
+change or preset switch); the controller makes no further decision until
+`applied()` reports that it is live.
+
+Settings are read from environment variables:
+    ENABLE_ADAPTIVE_TUNING    - turn the controller on (default: false)
+    ADAPTIVE_P95_TARGET_MS    - p95 time-to-first-audio target (default: 1500)
+    ADAPTIVE_MIN_OUTPUT_TOKENS - lowest cap the controller may set (default: 256)
+    ADAPTIVE_MAX_OUTPUT_TOKENS - highest cap the controller may set (default: 2048)
+    ADAPTIVE_WINDOW_TURNS     - turns in the latency window (default: 20)
+    ADAPTIVE_COOLDOWN_TURNS   - turns between two adjustments (default: 5)
+"""
+
+import os
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Optional, Union
+
+# Appended to the instructions once the token cap alone is not enough
+BREVITY_HINT = (
+    "Keep every answer short and conversational: two or three sentences, "
+    "then stop and let the other person speak."
+)
+
+
+@dataclass
+class TuningBounds:
+    p95_target_ms: float = 1500.0
+    min_output_tokens: int = 256
+    max_output_tokens: int = 2048
+    window_turns: int = 20
+    cooldown_turns: int = 5
+    # Only relax once p95 is comfortably under the target
+    relax_ratio: float = 0.6
+    step: float = 0.75
+
+    @classmethod
+    def from_env(cls) -> "TuningBounds":
+        return cls(
+            p95_target_ms=float(os.getenv("ADAPTIVE_P95_TARGET_MS", "1500")),
+            min_output_tokens=int(os.getenv("ADAPTIVE_MIN_OUTPUT_TOKENS", "256")),
+            max_output_tokens=int(os.getenv("ADAPTIVE_MAX_OUTPUT_TOKENS", "2048")),
+            window_turns=int(os.getenv("ADAPTIVE_WINDOW_TURNS", "20")),
+            cooldown_turns=int(os.getenv("ADAPTIVE_COOLDOWN_TURNS", "5")),
+        )
+
+
+@dataclass
+class Adjustment:
+    """A parameter change decided by the controller"""
+    max_output_tokens: int
+    tighten_instructions: bool
+    p95_ms: float
+    mean_utterance_chars: float
+    reason: str
+
+
+class LatencyController:
+    """Track per-turn latency and decide output-token caps"""
+
+    def __init__(self, bounds: TuningBounds, initial_output_tokens: Optional[int] = None):
+        self.bounds = bounds
+        self.max_output_tokens = min(
+            initial_output_tokens or bounds.max_output_tokens, bounds.max_output_tokens
+        )
+        self.max_output_tokens = max(self.max_output_tokens, bounds.min_output_tokens)
+        self.tighten_instructions = False
+        self.latencies_ms: Deque[float] = deque(maxlen=bounds.window_turns)
+        self.utterance_chars: Deque[int] = deque(maxlen=bounds.window_turns)
+        self.turns = 0
+        self._last_adjusted_turn = 0
+        # The last decision is not in a live session yet
+        self.pending = False
+
+    @staticmethod
+    def enabled() -> bool:
+        return os.getenv("ENABLE_ADAPTIVE_TUNING", "false").lower() == "true"
+
+    def p95_ms(self) -> float:
+        if not self.latencies_ms:
+            return 0.0
+        values = sorted(self.latencies_ms)
+        return values[min(len(values) - 1, int(0.95 * len(values)))]
+
+    def record_turn(self, time_to_first_audio_ms: float, utterance_chars: int) -> Optional[Adjustment]:
+        """Record one agent turn and return an adjustment if one is due"""
+        self.turns += 1
+        self.latencies_ms.append(time_to_first_audio_ms)
+        self.utterance_chars.append(utterance_chars)
+
+        if self.pending or len(self.latencies_ms) < self.latencies_ms.maxlen // 2:
+            return None
+        if self.turns - self._last_adjusted_turn < self.bounds.cooldown_turns:
+            return None
+
+        p95 = self.p95_ms()
+        bounds = self.bounds
+        tokens = self.max_output_tokens
+        tighten = self.tighten_instructions
+
+        if p95 > bounds.p95_target_ms:
+            if tokens > bounds.min_output_tokens:
+                tokens = max(bounds.min_output_tokens, int(tokens * bounds.step))
+                reason = "p95 over target, lowering output token cap"
+            elif not tighten:
+                tighten = True
+                reason = "p95 over target at minimum cap, tightening instructions"
+            else:
+                return None
+        elif p95 < bounds.p95_target_ms * bounds.relax_ratio:
+            if tighten:
+                tighten = False
+                reason = "p95 recovered, dropping brevity instructions"
+            elif tokens < bounds.max_output_tokens:
+                tokens = min(bounds.max_output_tokens, int(tokens / bounds.step))
+                reason = "p95 recovered, raising output token cap"
+            else:
+                return None
+        else:
+            return None
+
+        adjustment = Adjustment(
+            max_output_tokens=tokens,
+            tighten_instructions=tighten,
+            p95_ms=p95,
+            mean_utterance_chars=sum(self.utterance_chars) / len(self.utterance_chars),
+            reason=reason,
+        )
+        self.max_output_tokens = tokens
+        self.tighten_instructions = tighten
+        self.pending = True
+        return adjustment
+
+    def applied(self):
+        """Called when a session starts with the current cap and instructions"""
+        if not self.pending:
+            return
+        self.pending = False
+        self._last_adjusted_turn = self.turns
+        # Judge the next decision on turns taken under the new parameters
+        self.latencies_ms.clear()
+        self.utterance_chars.clear()
+
+    def clamp_output_tokens(self, requested: Union[str, int]) -> int:
+        """Apply the current cap to a token limit requested by the client"""
+        if requested == "inf":
+            return self.max_output_tokens
+        return min(int(requested), self.max_output_tokens)
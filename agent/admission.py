@@ -0,0 +1,227 @@
+"""
+Job Admission Control
+
+Decides, in the worker process, which room jobs to accept. Jobs are admitted
+straight away while there are free slots; otherwise they wait in a bounded
+priority queue (paying rooms ahead of playground rooms, read from the room
+metadata) for up to ADMISSION_MAX_WAIT seconds. When the queue is full the
+least important job is shed and returned to the server early, so another
+worker can take it. Jobs are also returned while `memory_check` reports that
+the container has no memory left for another session.
+
+The worker only reports itself full, and so stops being sent jobs, once all
+AGENT_MAX_JOBS slots are running. With the default ADMISSION_MAX_ACTIVE the
+queue therefore only holds jobs that arrive before the next load update has
+reached the server. Set ADMISSION_MAX_ACTIVE below AGENT_MAX_JOBS to keep the
+worker advertising capacity while it queues and sheds rooms by tier.
+
+Settings are read from environment variables:
+    ADMISSION_MAX_ACTIVE       - concurrent rooms (default: AGENT_MAX_JOBS)
+    ADMISSION_MAX_QUEUE        - jobs allowed to wait for a slot (default: 16)
+    ADMISSION_MAX_WAIT         - seconds a job may wait for a slot (default: 5)
+    ADMISSION_TIER_PRIORITIES  - "tier:priority" pairs, lower runs first
+                                 (default: "paid:0,default:5,playground:10")
+    PARTICIPANT_WAIT_TIMEOUT   - seconds a room waits for its participant
+                                 (default: 60)
+"""
+
+import asyncio
+import heapq
+import itertools
+import json
+import logging
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Dict, List, Optional
+
+from loop_monitor import percentile
+from structured_log import StructuredLogger
+
+logger = logging.getLogger("admission")
+slog = StructuredLogger(logger)
+
+DEFAULT_TIER = "default"
+
+
+def _parse_priorities(value: str) -> Dict[str, int]:
+    priorities = {}
+    for pair in value.split(","):
+        if ":" in pair:
+            tier, priority = pair.split(":", 1)
+            priorities[tier.strip()] = int(priority)
+    return priorities
+
+
+@dataclass
+class AdmissionSettings:
+    max_active: int
+    max_queue: int = 16
+    max_wait: float = 5.0
+    participant_wait_timeout: float = 60.0
+    reservation_ttl: float = 10.0
+    report_interval: float = 30.0
+    tier_priorities: Dict[str, int] = field(
+        default_factory=lambda: {"paid": 0, DEFAULT_TIER: 5, "playground": 10}
+    )
+
+    @classmethod
+    def from_env(cls, default_max_active: int = 1) -> "AdmissionSettings":
+        return cls(
+            max_active=int(os.getenv("ADMISSION_MAX_ACTIVE", str(default_max_active))),
+            max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", "16")),
+            max_wait=float(os.getenv("ADMISSION_MAX_WAIT", "5")),
+            participant_wait_timeout=float(os.getenv("PARTICIPANT_WAIT_TIMEOUT", "60")),
+            tier_priorities=_parse_priorities(
+                os.getenv("ADMISSION_TIER_PRIORITIES", "paid:0,default:5,playground:10")
+            ),
+        )
+
+    def room_priority(self, room_metadata: str) -> int:
+        """Priority for a room from the "tier" field of its JSON metadata"""
+        tier = DEFAULT_TIER
+        try:
+            metadata = json.loads(room_metadata) if room_metadata else {}
+            if isinstance(metadata, dict):
+                tier = str(metadata.get("tier", DEFAULT_TIER))
+        except json.JSONDecodeError:
+            pass
+        return self.tier_priorities.get(tier, self.tier_priorities.get(DEFAULT_TIER, 0))
+
+
+class AdmissionController:
+    """Slot accounting, a bounded priority queue and load shedding for jobs"""
+
+    def __init__(self, settings: AdmissionSettings, memory_check: Optional[Callable[[], bool]] = None):
+        self.settings = settings
+        self.memory_check = memory_check
+        self._active = 0
+        # Slots promised to accepted jobs that the worker does not report yet
+        self._reservations: Deque[float] = deque()
+        self._queue: List[list] = []
+        self._seq = itertools.count()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._last_report = time.monotonic()
+
+        self.admitted = 0
+        self.shed = 0
+        self.timed_out = 0
+        self.refused_memory = 0
+        self.wait_ms: Deque[float] = deque(maxlen=1000)
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(1 for entry in self._queue if not entry[2].done())
+
+    def _in_use(self) -> int:
+        now = time.monotonic()
+        while self._reservations and now - self._reservations[0] > self.settings.reservation_ttl:
+            self._reservations.popleft()
+        return self._active + len(self._reservations)
+
+    def _reserve(self, waited: float):
+        self._reservations.append(time.monotonic())
+        self.admitted += 1
+        self.wait_ms.append(waited * 1000)
+
+    def _wake(self):
+        while self._queue and self._in_use() < self.settings.max_active:
+            _, _, waiter, enqueued_at = heapq.heappop(self._queue)
+            if waiter.done():
+                continue
+            self._reserve(time.monotonic() - enqueued_at)
+            waiter.set_result(True)
+
+    def _set_active(self, active: int):
+        started = active - self._active
+        for _ in range(min(max(started, 0), len(self._reservations))):
+            self._reservations.popleft()
+        self._active = active
+        self._wake()
+
+    def update_active(self, active: int):
+        """Report the number of running jobs; safe to call from any thread"""
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._set_active, active)
+        else:
+            self._active = active
+
+        now = time.monotonic()
+        if now - self._last_report >= self.settings.report_interval:
+            self._last_report = now
+            # load_fnc runs in an executor thread; read the counters on the loop
+            if self._loop is not None and not self._loop.is_closed():
+                self._loop.call_soon_threadsafe(self.report)
+            else:
+                self.report()
+
+    async def admit(self, priority: int, label: str = "") -> bool:
+        """Wait for a slot; returns False when the job is shed or times out"""
+        self._loop = asyncio.get_running_loop()
+
+        if not self.queue_depth and self._in_use() < self.settings.max_active:
+            self._reserve(0.0)
+            return True
+
+        if self.queue_depth >= self.settings.max_queue:
+            pending = [entry for entry in self._queue if not entry[2].done()]
+            worst = max(pending, key=lambda entry: (entry[0], entry[1]))
+            if worst[0] <= priority:
+                self.shed += 1
+                slog.info("job_shed", room=label, queue_depth=self.queue_depth)
+                return False
+            # Make room by returning the least important waiting job
+            worst[2].set_result(False)
+            self.shed += 1
+
+        waiter = self._loop.create_future()
+        entry = [priority, next(self._seq), waiter, time.monotonic()]
+        heapq.heappush(self._queue, entry)
+
+        try:
+            admitted = await asyncio.wait_for(asyncio.shield(waiter), self.settings.max_wait)
+        except asyncio.TimeoutError:
+            # A slot may have been handed over right as the wait expired
+            admitted = waiter.done() and not waiter.cancelled() and waiter.result()
+            if not admitted:
+                self.timed_out += 1
+                slog.info("job_wait_timeout", room=label, max_wait_s=self.settings.max_wait)
+        finally:
+            if not waiter.done():
+                waiter.cancel()
+            self._queue = [queued for queued in self._queue if not queued[2].done()]
+            heapq.heapify(self._queue)
+
+        return admitted
+
+    async def request_fnc(self, req):
+        """WorkerOptions.request_fnc: accept or return a job request"""
+        room = req.room
+        if self.memory_check is not None and not self.memory_check():
+            self.refused_memory += 1
+            slog.info("job_refused_memory", room=room.name)
+            await req.reject()
+            return
+
+        priority = self.settings.room_priority(room.metadata)
+        if await self.admit(priority, room.name):
+            await req.accept()
+        else:
+            await req.reject()
+
+    def snapshot(self) -> Dict:
+        waits = sorted(self.wait_ms)
+        return {
+            "active": self._active,
+            "reserved": len(self._reservations),
+            "queue_depth": self.queue_depth,
+            "admitted": self.admitted,
+            "shed": self.shed,
+            "timed_out": self.timed_out,
+            "refused_memory": self.refused_memory,
+            "wait_ms": {"p50": percentile(waits, 50), "p95": percentile(waits, 95)},
+        }
+
+    def report(self):
+        slog.info("admission", **self.snapshot())
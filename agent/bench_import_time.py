@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Import Time Benchmark
+
+Job processes import these modules before they can take a room, so their
+import cost is part of worker startup time. This script measures it with
+`python -X importtime`, checks that importing them creates no files, and
+fails when a module exceeds its budget in import_time_budget.json.
+
+Each module is timed as the median of --runs imports, interleaved with
+imports of REFERENCE_MODULE (asyncio, which most of them pull in). When the
+reference imports slower than when the budget was recorded, the budgets are
+scaled up to match, so they do not fail on a slower or busier machine. On a
+shared host the medians still vary by a third from one run to the next, which
+the budget's margin absorbs; the regressions it is there for, such as a
+module-level import of livekit, cost several times that.
+
+The check also runs as a perf test (tests/test_performance.py), so
+`python -m pytest` enforces it. Record the budget on the machine that runs
+the tests, with the packages in requirements.txt installed.
+
+Run with:
+python bench_import_time.py            # check against the budget
+python bench_import_time.py --update   # re-record the budget on this host
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from typing import Dict, List, Optional
+
+AGENT_DIR = os.path.dirname(os.path.abspath(__file__))
+BUDGET_FILE = os.path.join(AGENT_DIR, "import_time_budget.json")
+
+# Modules that must stay cheap and side-effect free to import
+MODULES = ["custom_instructions", "instruction_monitor", "worker_pool", "loop_monitor"]
+
+# Stdlib import timed alongside the modules to calibrate for host speed
+REFERENCE_MODULE = "asyncio"
+
+# Headroom applied when recording a new budget; a few-millisecond import
+# jitters by more than the ratio, so it also gets an absolute minimum
+BUDGET_HEADROOM = 1.5
+MIN_HEADROOM_US = 5000
+
+
+def measure_once(module: str) -> Dict[str, object]:
+    """Import `module` in a fresh interpreter inside an empty directory"""
+    with tempfile.TemporaryDirectory() as cwd:
+        env = dict(os.environ, PYTHONPATH=AGENT_DIR, PYTHONDONTWRITEBYTECODE="1")
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=cwd,
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        created_files = os.listdir(cwd)
+
+    cumulative_us = 0
+    for line in result.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        parts = [part.strip() for part in line.split("|")]
+        if len(parts) == 3 and parts[2] == module:
+            cumulative_us = int(parts[1])
+    return {"cumulative_us": cumulative_us, "created_files": created_files}
+
+
+def measure(runs: int) -> Dict[str, Dict[str, object]]:
+    """Median import time and created files per module, reference included"""
+    samples: Dict[str, List[int]] = {module: [] for module in [REFERENCE_MODULE, *MODULES]}
+    created_files: Dict[str, set] = {module: set() for module in samples}
+    for _ in range(runs):
+        for module in samples:
+            result = measure_once(module)
+            samples[module].append(result["cumulative_us"])
+            created_files[module].update(result["created_files"])
+    return {
+        module: {"median_us": int(statistics.median(samples[module])), "created_files": sorted(created_files[module])}
+        for module in samples
+    }
+
+
+def load_budget() -> Dict[str, object]:
+    if not os.path.exists(BUDGET_FILE):
+        return {}
+    with open(BUDGET_FILE) as f:
+        return json.load(f)
+
+
+def new_budget(results: Dict[str, Dict[str, object]]) -> Dict[str, object]:
+    modules = {}
+    for module in MODULES:
+        median_us = results[module]["median_us"]
+        modules[module] = max(int(median_us * BUDGET_HEADROOM), median_us + MIN_HEADROOM_US)
+    return {"reference_us": results[REFERENCE_MODULE]["median_us"], "modules": modules}
+
+
+def scale(results: Dict[str, Dict[str, object]], budget: Dict[str, object]) -> float:
+    """How much slower this host imports the reference than the recording host"""
+    if not budget.get("reference_us"):
+        return 1.0
+    # Only relax budgets on a slower host, never tighten them
+    return max(results[REFERENCE_MODULE]["median_us"] / budget["reference_us"], 1.0)
+
+
+def limit(module: str, results: Dict[str, Dict[str, object]], budget: Dict[str, object]) -> Optional[int]:
+    recorded = budget.get("modules", {}).get(module)
+    return None if recorded is None else int(recorded * scale(results, budget))
+
+
+def failures(results: Dict[str, Dict[str, object]], budget: Dict[str, object]) -> List[str]:
+    """Every module over its budget or creating files on import"""
+    problems = []
+    for module in MODULES:
+        result = results[module]
+        if result["created_files"]:
+            problems.append(f"{module}: import created files {result['created_files']}")
+        module_limit = limit(module, results, budget)
+        if module_limit is not None and result["median_us"] > module_limit:
+            problems.append(f"{module}: median {result['median_us']} us (budget {module_limit} us)")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=15)
+    parser.add_argument("--update", action="store_true", help="record a new budget")
+    args = parser.parse_args()
+
+    budget = {} if args.update else load_budget()
+
+    print("Import Time Benchmark")
+    print("=" * 50)
+
+    results = measure(args.runs)
+    print(f"{REFERENCE_MODULE}: median {results[REFERENCE_MODULE]['median_us']} us "
+          f"(budgets scaled x{scale(results, budget):.2f})")
+    problems = failures(results, budget)
+    for module in MODULES:
+        mark = "✗" if any(problem.startswith(f"{module}:") for problem in problems) else "✓"
+        module_limit = limit(module, results, budget)
+        suffix = "" if module_limit is None else f" (budget {module_limit} us)"
+        print(f"{mark} {module}: median {results[module]['median_us']} us{suffix}")
+    for problem in problems:
+        print(f"✗ {problem}")
+
+    if args.update:
+        with open(BUDGET_FILE, "w") as f:
+            json.dump(new_budget(results), f, indent=2)
+            f.write("\n")
+        print(f"\nBudget written to {BUDGET_FILE}")
+
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
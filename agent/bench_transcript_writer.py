@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Transcript Writer Benchmark
+
+Measures what handing transcripts to TranscriptWriter costs the event loop: a
+simulated turn loop commits a user and an agent utterance every turn, with
+and without a writer. It then floods the writer to show that backpressure
+drops transcripts instead of blocking.
+
+This is only the storage side. Turning on ENABLE_TRANSCRIPTION also makes
+every Gemini session run its transcriber sessions, which receive every audio
+frame of the room; that cost is in the plugin and on the network and is not
+measured here.
+
+Run with:
+python bench_transcript_writer.py [--turns 2000]
+"""
+
+import argparse
+import math
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from transcripts import TranscriptSettings, TranscriptWriter  # noqa: E402
+
+FRAME = [int(8000 * math.sin(i / 7.0)) for i in range(480)]
+FRAMES_PER_TURN = 10
+USER_TEXT = "What's your number one superpower and how have you used it recently?"
+AGENT_TEXT = "Building autonomous AI agents end to end, from retrieval to deployment. " * 3
+
+
+def process_frame() -> float:
+    total = 0
+    for sample in FRAME:
+        scaled = (sample * 3) >> 2
+        total += scaled * scaled
+    return math.sqrt(total / len(FRAME))
+
+
+def run_turns(turns: int, writer=None):
+    """Per-turn latency in microseconds, plus seconds spent in submit()"""
+    latencies = []
+    submit_seconds = 0.0
+    for turn in range(turns):
+        start = time.perf_counter()
+        for _ in range(FRAMES_PER_TURN):
+            process_frame()
+        if writer is not None:
+            submit_start = time.perf_counter()
+            writer.submit("bench-room", "human", "user", USER_TEXT)
+            writer.submit("bench-room", "human", "assistant", AGENT_TEXT)
+            submit_seconds += time.perf_counter() - submit_start
+        latencies.append((time.perf_counter() - start) * 1e6)
+    return latencies, submit_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--turns", type=int, default=2000)
+    args = parser.parse_args()
+
+    print("Transcript Writer Benchmark")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        run_turns(args.turns // 10)  # warm up
+        off, _ = run_turns(args.turns)
+
+        writer = TranscriptWriter(TranscriptSettings(db_path=os.path.join(tmp, "bench.sqlite3")))
+        writer.start()
+        on, submit_seconds = run_turns(args.turns, writer)
+        writer.close()
+
+        off_p50, on_p50 = statistics.median(off), statistics.median(on)
+        print(f"turn p50 no writer: {off_p50:.1f} us")
+        print(f"turn p50 writer:    {on_p50:.1f} us ({(on_p50 / off_p50 - 1) * 100:+.1f}%)")
+        print(f"submit cost:        {submit_seconds / (2 * args.turns) * 1e6:.2f} us per transcript")
+        print(f"writer:             {writer.stats()}")
+
+        # Backpressure: a tiny queue and no pause between submits
+        flooded = TranscriptWriter(
+            TranscriptSettings(db_path=os.path.join(tmp, "flood.sqlite3"), queue_size=10)
+        )
+        flooded.start()
+        start = time.perf_counter()
+        for i in range(10000):
+            flooded.submit(f"room-{i % 10}", "human", "user", USER_TEXT)
+        elapsed = time.perf_counter() - start
+        flooded.close()
+        print()
+        print(f"flood: 10000 submits in {elapsed * 1000:.1f} ms, {flooded.stats()}")
+
+
+if __name__ == "__main__":
+    main()
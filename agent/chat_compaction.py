@@ -0,0 +1,78 @@
+"""
+Chat History Compaction
+
+Shrinks a chat history to the leading system prompt, a summary of older
+turns and the last CHAT_SNAPSHOT_KEEP_LAST messages verbatim. The summary
+is lossy, so it is only applied when asked for explicitly (e.g. when a room
+goes over its memory budget); reconfiguring a session keeps the full history.
+
+Settings are read from environment variables:
+    CHAT_SNAPSHOT_KEEP_LAST   - messages kept verbatim (default: 20)
+    CHAT_SUMMARY_MAX_CHARS    - size of the older-turns summary (default: 4000)
+"""
+
+import os
+from typing import Callable, List, Optional
+
+SUMMARY_HEADER = "Summary of the earlier conversation (oldest first):"
+SUMMARY_LINE_CHARS = 200
+
+
+def _create_system_message(text: str):
+    from livekit.agents import llm
+
+    return llm.ChatMessage.create(text=text, role="system")
+
+
+class ChatCompactor:
+    """Replace older turns of a chat history with a bounded summary"""
+
+    def __init__(
+        self,
+        keep_last: Optional[int] = None,
+        summary_max_chars: Optional[int] = None,
+        create_system_message: Callable = _create_system_message,
+    ):
+        self.keep_last = keep_last if keep_last is not None else int(os.getenv("CHAT_SNAPSHOT_KEEP_LAST", "20"))
+        self.summary_max_chars = (
+            summary_max_chars if summary_max_chars is not None else int(os.getenv("CHAT_SUMMARY_MAX_CHARS", "4000"))
+        )
+        self.create_system_message = create_system_message
+
+    def compact(self, messages: List) -> List:
+        """Leading system prompt + summary of older turns + recent messages"""
+        if len(messages) <= self.keep_last + 1:
+            return list(messages)
+
+        first = messages[0]
+        is_prompt = first.role == "system" and not str(first.content).startswith(SUMMARY_HEADER)
+        head = [first] if is_prompt else []
+        older = messages[len(head):len(messages) - self.keep_last]
+        recent = messages[len(messages) - self.keep_last:]
+
+        lines = []
+        budget = self.summary_max_chars
+        # Walk newest to oldest so the most recent context survives the budget
+        for line in (line for msg in reversed(older) for line in reversed(self._summary_lines(msg))):
+            if len(line) + 1 > budget:
+                break
+            lines.append(line)
+            budget -= len(line) + 1
+
+        if not lines:
+            return head + recent
+        summary = self.create_system_message("\n".join([SUMMARY_HEADER, *reversed(lines)]))
+        return head + [summary] + recent
+
+    @staticmethod
+    def _summary_lines(msg) -> List[str]:
+        """Summary lines for one message, oldest first"""
+        if not isinstance(msg.content, str) or not msg.content:
+            return []
+        if msg.role == "system" and msg.content.startswith(SUMMARY_HEADER):
+            # A summary from an earlier compaction keeps its lines as they are
+            return msg.content.split("\n")[1:]
+        text = msg.content.replace("\n", " ")
+        if len(text) > SUMMARY_LINE_CHARS:
+            text = text[:SUMMARY_LINE_CHARS] + "..."
+        return [f"{msg.role}: {text}"]
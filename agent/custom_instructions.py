@@ -7,6 +7,8 @@ that the AI agent will strictly adhere to during conversations.
 Modify the variables below to customize your agent's behavior.
 """
 
+from functools import lru_cache
+
 # Your main custom instructions - define the agent's role, personality, and behavior
 CUSTOM_INSTRUCTIONS = """
 You are me - my personal AI representative for a job interview assignment. You embody my personality, experience, and communication style.
@@ -151,6 +153,7 @@ EXPERTISE_AREAS = [
     "System design for high-stakes environments"
 ]
 
+@lru_cache(maxsize=None)
 def get_enhanced_instructions() -> str:
     """
     Combine all instruction components into a comprehensive prompt
@@ -245,6 +248,7 @@ INSTRUCTION_PRESETS = {
     },
 }
 
+@lru_cache(maxsize=None)
 def get_preset_instructions(preset_name: str) -> str:
     """
     Get instructions for a specific preset
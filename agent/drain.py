@@ -0,0 +1,176 @@
+"""
+Graceful Drain
+
+Lets a deploy restart the agent without cutting interviews off mid-sentence.
+A drain is requested by SIGUSR1 or SIGTERM to the worker, or by the pg.drain
+RPC. It is recorded in a marker file that every process on the host can see:
+
+- the worker reports itself full and refuses new jobs
+- each room waits for the agent to finish its current turn (or for the
+  deadline), ends its session and shuts its job down
+- once no jobs are left, the worker logs how long the drain took and how
+  many sessions it affected, moves the marker to `<marker>.done` with those
+  figures and accepts jobs again
+
+On SIGTERM LiveKit runs its own drain, which keeps the worker full but never
+tells the job processes. The marker is written first, so rooms still end at a
+turn boundary before LiveKit's drain timeout runs out. That timeout is the
+CLI's `start --drain-timeout` (default 60s, and `dev` does not drain at all),
+so the Dockerfile passes AGENT_DRAIN_TIMEOUT to it.
+
+The deadline is shared: AGENT_DRAIN_TIMEOUT seconds after the request.
+
+Settings are read from environment variables:
+    AGENT_DRAIN_FILE      - marker file (default: /tmp/gemini-agent.drain)
+    AGENT_DRAIN_TIMEOUT   - seconds until sessions are ended regardless
+                            (default: 120)
+    AGENT_DRAIN_TOKEN     - secret required by the pg.drain RPC; the RPC is
+                            disabled when unset
+"""
+
+import asyncio
+import json
+import logging
+import os
+import signal
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from structured_log import StructuredLogger
+
+logger = logging.getLogger("drain")
+slog = StructuredLogger(logger)
+
+
+@dataclass
+class DrainSettings:
+    marker_path: str = "/tmp/gemini-agent.drain"
+    timeout: float = 120.0
+    poll_interval: float = 1.0
+    token: str = ""
+
+    @property
+    def report_path(self) -> str:
+        return f"{self.marker_path}.done"
+
+    @classmethod
+    def from_env(cls) -> "DrainSettings":
+        return cls(
+            marker_path=os.getenv("AGENT_DRAIN_FILE", "/tmp/gemini-agent.drain"),
+            timeout=float(os.getenv("AGENT_DRAIN_TIMEOUT", "120")),
+            token=os.getenv("AGENT_DRAIN_TOKEN", ""),
+        )
+
+
+def _write_state(settings: DrainSettings, state: Dict):
+    tmp_path = f"{settings.marker_path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, settings.marker_path)
+
+
+def drain_state(settings: DrainSettings) -> Optional[Dict]:
+    """The current drain request, or None if there is none"""
+    try:
+        with open(settings.marker_path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, json.JSONDecodeError):
+        # Unreadable marker: still a drain, with the default deadline
+        return {"reason": "unknown", "deadline": time.time() + settings.timeout}
+
+
+def request_drain(settings: DrainSettings, reason: str) -> Dict:
+    """Start a drain, or return the one already in progress"""
+    state = drain_state(settings)
+    if state is None:
+        now = time.time()
+        state = {"reason": reason, "requested_at": now, "deadline": now + settings.timeout, "drained": False}
+        _write_state(settings, state)
+        slog.info("drain_requested", reason=reason, timeout_s=settings.timeout)
+    return state
+
+
+def clear_drain(settings: DrainSettings):
+    try:
+        os.remove(settings.marker_path)
+    except FileNotFoundError:
+        pass
+
+
+def drain_on_sigterm(settings: DrainSettings):
+    """Write the drain marker on SIGTERM, then run the handler installed before.
+
+    Must be called after LiveKit's CLI has installed its own SIGTERM handler.
+    """
+    previous = signal.getsignal(signal.SIGTERM)
+
+    def on_sigterm(signum, frame):
+        request_drain(settings, "SIGTERM")
+        if callable(previous):
+            previous(signum, frame)
+        elif previous == signal.SIG_DFL:
+            signal.signal(signum, signal.SIG_DFL)
+            os.kill(os.getpid(), signum)
+
+    signal.signal(signal.SIGTERM, on_sigterm)
+
+
+async def wait_for_drain(settings: DrainSettings) -> Dict:
+    """Poll the marker file until a drain is requested"""
+    while True:
+        state = drain_state(settings)
+        if state is not None:
+            return state
+        await asyncio.sleep(settings.poll_interval)
+
+
+class WorkerDrain:
+    """Drain bookkeeping for the worker process, driven by its load_fnc"""
+
+    def __init__(self, settings: DrainSettings):
+        self.settings = settings
+        self._reset()
+
+    def _reset(self):
+        self.started_at: Optional[float] = None
+        self.requested_at = 0.0
+        self.deadline = 0.0
+        self.sessions_affected = 0
+        self.overdue = False
+        self.refused = 0
+
+    @property
+    def draining(self) -> bool:
+        return self.started_at is not None
+
+    def update(self, active_jobs: int):
+        """Called with the current job count on every load update"""
+        if self.started_at is None:
+            state = drain_state(self.settings)
+            if state is None:
+                return
+            self.started_at = time.monotonic()
+            self.sessions_affected = active_jobs
+            self.requested_at = state.get("requested_at", time.time())
+            self.deadline = state.get("deadline", self.requested_at + self.settings.timeout)
+            slog.info("drain_started", sessions=active_jobs)
+
+        if active_jobs == 0:
+            duration = time.time() - self.requested_at
+            state = drain_state(self.settings) or {}
+            state.update(drained=True, duration_s=duration, sessions_affected=self.sessions_affected)
+            _write_state(self.settings, state)
+            os.replace(self.settings.marker_path, self.settings.report_path)
+            slog.info(
+                "drain_complete",
+                duration_s=duration,
+                sessions_affected=self.sessions_affected,
+                jobs_refused=self.refused,
+            )
+            self._reset()
+        elif not self.overdue and time.time() > self.deadline:
+            self.overdue = True
+            slog.warning("drain_overdue", sessions=active_jobs)
@@ -7,32 +7,78 @@ and test different instruction configurations.
 
 import logging
 import json
+import os
+from collections import deque
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Deque, Dict, Optional
 from dataclasses import dataclass, asdict
 
+from structured_log import StructuredLogger
+
 @dataclass
 class InstructionEvent:
     """Log entry for instruction-related events"""
     timestamp: str
-    event_type: str  # 'reinforcement_added', 'config_changed', 'off_topic_detected'
+    event_type: str  # 'reinforcement_added', 'config_changed', 'parameter_adjusted', 'off_topic_detected'
     details: Dict
     participant_id: Optional[str] = None
 
 class InstructionMonitor:
-    """Monitor and log instruction adherence events"""
+    """Monitor and log instruction adherence events.
+
+    Only the most recent INSTRUCTION_MONITOR_MAX_EVENTS events (default 1000)
+    are kept; statistics are counted as events arrive, so memory stays flat
+    however long the process runs.
+    """
     
-    def __init__(self, log_file: str = "instruction_adherence.log"):
+    def __init__(self, log_file: str = "instruction_adherence.log", max_events: Optional[int] = None):
         self.log_file = log_file
         self.logger = logging.getLogger("instruction_monitor")
-        self.events: List[InstructionEvent] = []
-        
-        # Setup file logging
-        handler = logging.FileHandler(log_file)
-        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-        handler.setFormatter(formatter)
-        self.logger.addHandler(handler)
+        if max_events is None:
+            max_events = int(os.getenv("INSTRUCTION_MONITOR_MAX_EVENTS", "1000"))
+        self.events: Deque[InstructionEvent] = deque(maxlen=max_events)
+        self.total_events = 0
+        self._events_by_type: Dict[str, int] = {}
+        self._sessions_by_preset: Dict[str, int] = {}
+        self._reinforcements_per_session: Dict[str, int] = {}
+        self._slog = StructuredLogger(self.logger)
+        self._handler_ready = False
+
+    def _ensure_file_handler(self):
+        """Attach the file handler on first use, at most once per log file"""
+        if self._handler_ready:
+            return
+        log_path = os.path.abspath(self.log_file)
+        for existing in self.logger.handlers:
+            if isinstance(existing, logging.FileHandler) and existing.baseFilename == log_path:
+                break
+        else:
+            handler = logging.FileHandler(log_path, delay=True)
+            # Records are JSON objects that carry their own timestamp and level
+            formatter = logging.Formatter('%(message)s')
+            handler.setFormatter(formatter)
+            self.logger.addHandler(handler)
         self.logger.setLevel(logging.INFO)
+        self._handler_ready = True
+
+    def _remember(self, event: InstructionEvent):
+        """Keep the event and update the running statistics"""
+        self.events.append(event)
+        self.total_events += 1
+
+        event_type = event.event_type
+        self._events_by_type[event_type] = self._events_by_type.get(event_type, 0) + 1
+        if event_type == "session_started":
+            preset = event.details.get("preset", "unknown")
+            self._sessions_by_preset[preset] = self._sessions_by_preset.get(preset, 0) + 1
+        if event_type == "reinforcement_added" and event.participant_id:
+            participant_id = event.participant_id
+            self._reinforcements_per_session[participant_id] = self._reinforcements_per_session.get(participant_id, 0) + 1
+
+    def _record(self, event: InstructionEvent):
+        self._remember(event)
+        self._ensure_file_handler()
+        self._slog.info(event.event_type, participant_id=event.participant_id, **event.details)
     
     def log_reinforcement_added(self, participant_id: str, message_count: int, instruction_preview: str):
         """Log when instruction reinforcement is added to conversation"""
@@ -45,8 +91,7 @@ class InstructionMonitor:
             },
             participant_id=participant_id
         )
-        self.events.append(event)
-        self.logger.info(f"Instruction reinforcement added for participant {participant_id} at message {message_count}")
+        self._record(event)
     
     def log_config_change(self, participant_id: str, old_preset: str, new_preset: str):
         """Log when instruction configuration changes"""
@@ -59,8 +104,7 @@ class InstructionMonitor:
             },
             participant_id=participant_id
         )
-        self.events.append(event)
-        self.logger.info(f"Instruction preset changed from {old_preset} to {new_preset} for participant {participant_id}")
+        self._record(event)
     
     def log_session_start(self, participant_id: str, preset: str, instructions_preview: str):
         """Log when a new session starts with specific instructions"""
@@ -73,37 +117,34 @@ class InstructionMonitor:
             },
             participant_id=participant_id
         )
-        self.events.append(event)
-        self.logger.info(f"Session started for participant {participant_id} with preset {preset}")
+        self._record(event)
+    
+    def log_parameter_adjustment(self, participant_id: str, max_output_tokens: int, tighten_instructions: bool, p95_ms: float, reason: str):
+        """Log when adaptive tuning changes model parameters"""
+        event = InstructionEvent(
+            timestamp=datetime.now().isoformat(),
+            event_type="parameter_adjusted",
+            details={
+                "max_output_tokens": max_output_tokens,
+                "tighten_instructions": tighten_instructions,
+                "p95_ms": p95_ms,
+                "reason": reason
+            },
+            participant_id=participant_id
+        )
+        self._record(event)
     
     def get_statistics(self) -> Dict:
         """Get statistics about instruction adherence"""
-        stats = {
-            "total_events": len(self.events),
-            "events_by_type": {},
-            "sessions_by_preset": {},
-            "reinforcements_per_session": {}
+        return {
+            "total_events": self.total_events,
+            "events_by_type": dict(self._events_by_type),
+            "sessions_by_preset": dict(self._sessions_by_preset),
+            "reinforcements_per_session": dict(self._reinforcements_per_session),
         }
-        
-        for event in self.events:
-            # Count events by type
-            event_type = event.event_type
-            stats["events_by_type"][event_type] = stats["events_by_type"].get(event_type, 0) + 1
-            
-            # Count sessions by preset
-            if event_type == "session_started":
-                preset = event.details.get("preset", "unknown")
-                stats["sessions_by_preset"][preset] = stats["sessions_by_preset"].get(preset, 0) + 1
-            
-            # Count reinforcements per participant
-            if event_type == "reinforcement_added" and event.participant_id:
-                participant_id = event.participant_id
-                stats["reinforcements_per_session"][participant_id] = stats["reinforcements_per_session"].get(participant_id, 0) + 1
-        
-        return stats
     
     def save_events_to_file(self, filename: str = None):
-        """Save all events to a JSON file"""
+        """Save the retained events to a JSON file"""
         filename = filename or f"instruction_events_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
         
         events_data = [asdict(event) for event in self.events]
@@ -115,10 +156,26 @@ class InstructionMonitor:
                 "export_timestamp": datetime.now().isoformat()
             }, f, indent=2)
         
-        self.logger.info(f"Events exported to {filename}")
+        self._ensure_file_handler()
+        self._slog.info("events_exported", filename=filename)
+
+_instruction_monitor: Optional[InstructionMonitor] = None
+
+
+def get_instruction_monitor() -> InstructionMonitor:
+    """Return the process-wide monitor, creating it on first use"""
+    global _instruction_monitor
+    if _instruction_monitor is None:
+        _instruction_monitor = InstructionMonitor()
+    return _instruction_monitor
+
 
-# Global monitor instance
-instruction_monitor = InstructionMonitor()
+def __getattr__(name: str):
+    # Keep `from instruction_monitor import instruction_monitor` working without
+    # creating the monitor (and its log file) at import time
+    if name == "instruction_monitor":
+        return get_instruction_monitor()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def test_instruction_configuration():
     """Test utility to validate instruction configurations"""
@@ -0,0 +1,241 @@
+"""
+Event Loop Monitoring
+
+Detects when something blocks the asyncio loop that drives realtime audio.
+
+LoopLagWatchdog samples scheduling lag continuously, keeps lag percentiles and
+logs them periodically. A helper thread watches the loop's heartbeat: when the
+loop stalls past the threshold it captures the stack of whatever is running on
+the loop thread, i.e. the offending callback.
+
+StackSampler is an opt-in sampling profiler for a chosen room. It writes
+collapsed stacks ("frame;frame;frame count") that flamegraph.pl, speedscope
+and inferno read directly.
+
+Settings are read from environment variables:
+    LOOP_LAG_THRESHOLD_MS     - lag that counts as a stall (default: 50)
+    LOOP_LAG_INTERVAL_MS      - sampling interval (default: 100)
+    LOOP_LAG_REPORT_INTERVAL  - seconds between percentile reports (default: 30)
+    LOOP_PROFILE_ROOM         - room name to profile, or "*" for all rooms
+    LOOP_PROFILE_INTERVAL_MS  - profiler sampling interval (default: 5)
+    LOOP_PROFILE_DIR          - directory for .folded output (default: .)
+"""
+
+import asyncio
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+from typing import Callable, Deque, Dict, List, Optional
+
+from structured_log import StructuredLogger
+
+logger = logging.getLogger("loop_monitor")
+slog = StructuredLogger(logger)
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+class StackSampler:
+    """Sampling profiler for the thread running the event loop"""
+
+    def __init__(self, thread_id: int, interval: float = 0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._run, name="loop-stack-sampler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            self.samples[";".join(reversed(stack))] += 1
+
+    def write_folded(self, path: str) -> int:
+        """Write collapsed stacks to `path`, returning the number of samples"""
+        with open(path, "w") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+        return sum(self.samples.values())
+
+
+class LoopLagWatchdog:
+    """Measure event loop lag and capture the stack of callbacks that stall it"""
+
+    def __init__(
+        self,
+        interval: float = 0.1,
+        threshold: float = 0.05,
+        report_interval: float = 30.0,
+        window: int = 3000,
+        label: str = "",
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.interval = interval
+        self.threshold = threshold
+        self.report_interval = report_interval
+        self.label = label
+        self.lags: Deque[float] = deque(maxlen=window)
+        self.stall_count = 0
+        self.last_stall_stack: Optional[str] = None
+
+        self._clock = clock
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._heartbeat = clock()
+        self._stall_captured = False
+        self._task: Optional[asyncio.Task] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._profiler: Optional[StackSampler] = None
+        self._profile_path: Optional[str] = None
+
+    @classmethod
+    def from_env(cls, label: str = "") -> "LoopLagWatchdog":
+        return cls(
+            interval=float(os.getenv("LOOP_LAG_INTERVAL_MS", "100")) / 1000,
+            threshold=float(os.getenv("LOOP_LAG_THRESHOLD_MS", "50")) / 1000,
+            report_interval=float(os.getenv("LOOP_LAG_REPORT_INTERVAL", "30")),
+            label=label,
+        )
+
+    def start(self):
+        """Start sampling; must be called from the loop being watched"""
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = self._clock()
+        self._task = asyncio.create_task(self._sample())
+        self._thread = threading.Thread(
+            target=self._watch, name="loop-lag-watchdog", daemon=True
+        )
+        self._thread.start()
+
+    def enable_profiler(self, path: str, interval: float = 0.005):
+        """Sample the loop thread's stacks until aclose() writes them to `path`"""
+        self._profiler = StackSampler(self._loop_thread_id or threading.get_ident(), interval)
+        self._profile_path = path
+        self._profiler.start()
+        slog.info("loop_profiler_enabled", room=self.label, path=path)
+
+    async def aclose(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+        if self._profiler is not None:
+            self._profiler.stop()
+            samples = self._profiler.write_folded(self._profile_path)
+            slog.info("loop_profile_written", room=self.label, samples=samples, path=self._profile_path)
+        self.report()
+
+    async def _sample(self):
+        last_report = self._clock()
+        while True:
+            started = self._clock()
+            await asyncio.sleep(self.interval)
+            self._record_lag(started)
+
+            if self._heartbeat - last_report >= self.report_interval:
+                last_report = self._heartbeat
+                self.report()
+
+    def _record_lag(self, started: float) -> float:
+        """Account for a sleep of `interval` that began at `started`"""
+        lag = max(0.0, self._clock() - started - self.interval)
+        self.lags.append(lag)
+        self._heartbeat = self._clock()
+        self._stall_captured = False
+
+        if lag > self.threshold:
+            self.stall_count += 1
+            slog.warning("loop_stalled", room=self.label, lag_ms=lag * 1000, stack=self.last_stall_stack)
+            self.last_stall_stack = None
+        return lag
+
+    def _watch(self):
+        """Runs off-loop: grab the loop thread's stack while it is stalled"""
+        while not self._stop.wait(self.interval / 2):
+            self._check_stall()
+
+    def _check_stall(self):
+        stalled_for = self._clock() - self._heartbeat - self.interval
+        if stalled_for <= self.threshold or self._stall_captured:
+            return
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return
+        self.last_stall_stack = "".join(traceback.format_stack(frame))
+        self._stall_captured = True
+
+    def percentiles(self) -> Dict[str, float]:
+        """Lag percentiles in milliseconds over the sampling window"""
+        values = sorted(self.lags)
+        return {
+            "p50": percentile(values, 50) * 1000,
+            "p95": percentile(values, 95) * 1000,
+            "p99": percentile(values, 99) * 1000,
+            "max": (values[-1] if values else 0.0) * 1000,
+        }
+
+    def snapshot(self) -> Dict:
+        return {
+            "samples": len(self.lags),
+            "stalls": self.stall_count,
+            "lag_ms": self.percentiles(),
+        }
+
+    def report(self):
+        slog.info("loop_lag", room=self.label, lag_ms=self.percentiles(), stalls=self.stall_count)
+
+
+def start_loop_monitoring(room_name: str) -> LoopLagWatchdog:
+    """Start the watchdog for a room, plus the profiler if it was asked for"""
+    watchdog = LoopLagWatchdog.from_env(label=room_name)
+    watchdog.start()
+
+    profile_room = os.getenv("LOOP_PROFILE_ROOM", "")
+    if profile_room and profile_room in ("*", room_name):
+        profile_dir = os.getenv("LOOP_PROFILE_DIR", ".")
+        # Room names come from clients; keep them from escaping the directory
+        safe_name = re.sub(r"[^\w.-]", "_", room_name)
+        path = os.path.join(profile_dir, f"loop_profile_{safe_name}_{int(time.time())}.folded")
+        interval = float(os.getenv("LOOP_PROFILE_INTERVAL_MS", "5")) / 1000
+        watchdog.enable_profiler(path, interval)
+
+    return watchdog
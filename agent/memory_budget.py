@@ -0,0 +1,256 @@
+"""
+Memory Accounting
+
+Measures what a room costs in memory and keeps it within a budget.
+
+Each room runs in its own job process, so a room's footprint is the growth of
+its process's resident memory since the job started. SessionMemory samples it
+periodically. When the growth passes MEMORY_SESSION_BUDGET_MB, it asks the
+session to compact its chat history, once: freed memory rarely goes back to
+the OS, so RSS stays high after a compaction. The next compaction is only
+armed once the growth has fallen below MEMORY_REARM_RATIO of the budget.
+In the worker process, has_headroom()
+lets admission refuse new rooms while the container lacks memory for another
+session.
+
+With MEMORY_TRACE enabled, a sample of the rooms (MEMORY_TRACE_SAMPLE_RATE)
+record allocations with tracemalloc, keeping a shallow stack (one frame by
+default). tracemalloc hooks every allocation of the process while it runs, so
+the other rooms pay nothing. Each check of a traced room lists the allocation
+sites that grew the most since the previous one.
+
+Settings are read from environment variables:
+    MEMORY_SESSION_BUDGET_MB  - memory a room may add to its process, 0 for no
+                                limit (default: 0)
+    MEMORY_CHECK_INTERVAL     - seconds between checks (default: 30)
+    MEMORY_REARM_RATIO        - fraction of the budget the growth must fall
+                                below before compacting again (default: 0.9)
+    MEMORY_TRACE              - record allocations with tracemalloc (default: false)
+    MEMORY_TRACE_SAMPLE_RATE  - fraction of rooms traced when MEMORY_TRACE is
+                                on (default: 0.1)
+    MEMORY_TRACE_FRAMES       - stack frames kept per allocation (default: 1)
+    MEMORY_TRACE_TOP          - allocation sites per report (default: 10)
+"""
+
+import asyncio
+import logging
+import os
+import random
+import resource
+import sys
+import tracemalloc
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from structured_log import StructuredLogger
+
+logger = logging.getLogger("memory_budget")
+slog = StructuredLogger(logger)
+
+MB = 1024 * 1024
+
+
+def current_rss() -> int:
+    """Resident memory of this process in bytes"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # Peak rather than current, but the best available without /proc
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _read_int(path: str) -> Optional[int]:
+    try:
+        with open(path) as f:
+            value = f.read().strip()
+    except OSError:
+        return None
+    return int(value) if value.isdigit() else None
+
+
+def available_memory() -> Optional[int]:
+    """Bytes still available to the container, or None if unknown"""
+    for limit_path, usage_path in (
+        ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory.current"),
+        ("/sys/fs/cgroup/memory/memory.limit_in_bytes", "/sys/fs/cgroup/memory/memory.usage_in_bytes"),
+    ):
+        limit, usage = _read_int(limit_path), _read_int(usage_path)
+        # cgroup v1 reports "no limit" as a huge number
+        if limit is not None and usage is not None and limit < 1 << 60:
+            return max(0, limit - usage)
+
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+@dataclass
+class MemorySettings:
+    session_budget_bytes: int = 0
+    check_interval: float = 30.0
+    rearm_ratio: float = 0.9
+    trace: bool = False
+    trace_sample_rate: float = 0.1
+    trace_frames: int = 1
+    trace_top: int = 10
+
+    @classmethod
+    def from_env(cls) -> "MemorySettings":
+        return cls(
+            session_budget_bytes=int(float(os.getenv("MEMORY_SESSION_BUDGET_MB", "0")) * MB),
+            check_interval=float(os.getenv("MEMORY_CHECK_INTERVAL", "30")),
+            rearm_ratio=float(os.getenv("MEMORY_REARM_RATIO", "0.9")),
+            trace=os.getenv("MEMORY_TRACE", "false").lower() == "true",
+            trace_sample_rate=float(os.getenv("MEMORY_TRACE_SAMPLE_RATE", "0.1")),
+            trace_frames=int(os.getenv("MEMORY_TRACE_FRAMES", "1")),
+            trace_top=int(os.getenv("MEMORY_TRACE_TOP", "10")),
+        )
+
+    def has_headroom(self) -> bool:
+        """Whether the container has room for one more session's budget"""
+        if not self.session_budget_bytes:
+            return True
+        available = available_memory()
+        return available is None or available >= self.session_budget_bytes
+
+
+class SessionMemory:
+    """Tracks a room's memory growth in its job process and enforces the budget"""
+
+    def __init__(
+        self,
+        room_name: str,
+        settings: Optional[MemorySettings] = None,
+        on_over_budget: Optional[Callable[[], Awaitable[int]]] = None,
+    ):
+        self.room_name = room_name
+        self.settings = settings or MemorySettings.from_env()
+        # Called when over budget; returns how many chat items it removed
+        self.on_over_budget = on_over_budget
+        self.baseline_rss = current_rss()
+        self.rss = self.baseline_rss
+        self.peak_session_bytes = 0
+        self.over_budget = 0
+        self.compactions = 0
+        self.armed = True
+        self.top_allocations: List[Dict] = []
+        self.traced = False
+        self._trace_snapshot: Optional[tracemalloc.Snapshot] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def session_bytes(self) -> int:
+        return max(0, self.rss - self.baseline_rss)
+
+    def start(self):
+        if (
+            self.settings.trace
+            and not tracemalloc.is_tracing()
+            and random.random() < self.settings.trace_sample_rate
+        ):
+            tracemalloc.start(self.settings.trace_frames)
+            self.traced = True
+        self._task = asyncio.create_task(self._run())
+
+    async def aclose(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.traced:
+            tracemalloc.stop()
+            self.traced = False
+        self.report()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.settings.check_interval)
+            try:
+                await self.check()
+            except Exception:
+                slog.exception("memory_check_failed", room=self.room_name)
+
+    async def check(self):
+        self.rss = current_rss()
+        self.peak_session_bytes = max(self.peak_session_bytes, self.session_bytes)
+
+        if self.traced:
+            self.top_allocations = await asyncio.to_thread(self._top_allocations)
+
+        budget = self.settings.session_budget_bytes
+        if not budget:
+            return
+        if self.session_bytes < budget * self.settings.rearm_ratio:
+            self.armed = True
+        elif self.session_bytes > budget:
+            self.over_budget += 1
+            if self.armed and self.on_over_budget is not None:
+                self.armed = False
+                removed = await self.on_over_budget()
+                if removed:
+                    self.compactions += 1
+                    slog.warning(
+                        "memory_over_budget",
+                        room=self.room_name,
+                        session_bytes=self.session_bytes,
+                        budget_bytes=budget,
+                        compacted=removed,
+                    )
+
+    def _top_allocations(self) -> List[Dict]:
+        """Allocation sites that grew the most since the previous check"""
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            (
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            )
+        )
+        previous, self._trace_snapshot = self._trace_snapshot, snapshot
+        if previous is None:
+            stats = snapshot.statistics("lineno")
+        else:
+            stats = snapshot.compare_to(previous, "lineno")
+        return [
+            {
+                "site": str(stat.traceback),
+                "size": stat.size,
+                "size_diff": getattr(stat, "size_diff", stat.size),
+                "count": stat.count,
+            }
+            for stat in stats[: self.settings.trace_top]
+        ]
+
+    def snapshot(self) -> Dict:
+        return {
+            "rss_bytes": self.rss,
+            "session_bytes": self.session_bytes,
+            "peak_session_bytes": self.peak_session_bytes,
+            "budget_bytes": self.settings.session_budget_bytes,
+            "over_budget": self.over_budget,
+            "compactions": self.compactions,
+            "traced": self.traced,
+            "top_allocations": self.top_allocations,
+        }
+
+    def report(self):
+        slog.info(
+            "memory",
+            room=self.room_name,
+            rss_bytes=self.rss,
+            session_bytes=self.session_bytes,
+            peak_session_bytes=self.peak_session_bytes,
+            budget_bytes=self.settings.session_budget_bytes,
+            over_budget=self.over_budget,
+            compactions=self.compactions,
+        )
+
@@ -0,0 +1,123 @@
+"""
+Per-Room Instruction Settings
+
+Lets one worker pool serve every persona. The instruction preset, strict mode
+and reinforcement settings are resolved for each room: environment variables
+give the defaults, room metadata overrides them and participant metadata
+overrides the room. All three use the same lowercase keys:
+
+    {"instruction_preset": "job_interview", "strict_instruction_mode": false,
+     "enable_instruction_reinforcement": true, "reinforcement_interval": 20}
+
+Compiled prompts come from the shared caches in custom_instructions, so rooms
+using the same preset share a single prompt string.
+"""
+
+import json
+import logging
+import os
+from dataclasses import dataclass, replace
+from typing import Any, Dict, Optional, Union
+
+from custom_instructions import INSTRUCTION_PRESETS
+from structured_log import StructuredLogger
+
+logger = logging.getLogger("room_settings")
+slog = StructuredLogger(logger)
+
+CUSTOM_PRESET = "custom"
+DEFAULT_REINFORCEMENT_INTERVAL = 15
+
+
+def _as_bool(value: Any) -> bool:
+    if isinstance(value, str):
+        return value.lower() == "true"
+    return bool(value)
+
+
+def _as_metadata(metadata: Union[str, Dict, None]) -> Dict:
+    if isinstance(metadata, dict):
+        return metadata
+    if not metadata:
+        return {}
+    try:
+        parsed = json.loads(metadata)
+    except json.JSONDecodeError:
+        return {}
+    return parsed if isinstance(parsed, dict) else {}
+
+
+def _as_interval(value: Any) -> Optional[int]:
+    """A reinforcement interval of at least one message, or None if invalid"""
+    try:
+        interval = int(value)
+    except (TypeError, ValueError):
+        return None
+    return interval if interval >= 1 else None
+
+
+@dataclass(frozen=True)
+class RoomSettings:
+    preset: str = CUSTOM_PRESET
+    strict_mode: bool = True
+    reinforcement_enabled: bool = True
+    reinforcement_interval: int = DEFAULT_REINFORCEMENT_INTERVAL
+
+    @classmethod
+    def from_env(cls) -> "RoomSettings":
+        value = os.getenv("REINFORCEMENT_INTERVAL", str(DEFAULT_REINFORCEMENT_INTERVAL))
+        interval = _as_interval(value)
+        if interval is None:
+            slog.warning(
+                "invalid_reinforcement_interval",
+                source="env",
+                value=value,
+                using=DEFAULT_REINFORCEMENT_INTERVAL,
+            )
+            interval = DEFAULT_REINFORCEMENT_INTERVAL
+        return cls(
+            preset=os.getenv("INSTRUCTION_PRESET", CUSTOM_PRESET),
+            strict_mode=_as_bool(os.getenv("STRICT_INSTRUCTION_MODE", "true")),
+            reinforcement_enabled=_as_bool(os.getenv("ENABLE_INSTRUCTION_REINFORCEMENT", "true")),
+            reinforcement_interval=interval,
+        )
+
+    def with_overrides(self, metadata: Dict) -> "RoomSettings":
+        """Apply the settings present in a metadata dict"""
+        settings = self
+        preset = metadata.get("instruction_preset")
+        if preset is not None:
+            if preset == CUSTOM_PRESET or preset in INSTRUCTION_PRESETS:
+                settings = replace(settings, preset=preset)
+            else:
+                slog.warning("unknown_preset", value=preset, using=settings.preset)
+        if "strict_instruction_mode" in metadata:
+            settings = replace(settings, strict_mode=_as_bool(metadata["strict_instruction_mode"]))
+        if "enable_instruction_reinforcement" in metadata:
+            settings = replace(
+                settings,
+                reinforcement_enabled=_as_bool(metadata["enable_instruction_reinforcement"]),
+            )
+        if "reinforcement_interval" in metadata:
+            interval = _as_interval(metadata["reinforcement_interval"])
+            if interval is not None:
+                settings = replace(settings, reinforcement_interval=interval)
+            else:
+                slog.warning(
+                    "invalid_reinforcement_interval",
+                    source="metadata",
+                    value=metadata["reinforcement_interval"],
+                    using=settings.reinforcement_interval,
+                )
+        return settings
+
+
+def resolve_room_settings(
+    room_metadata: Union[str, Dict, None],
+    participant_metadata: Union[str, Dict, None],
+    defaults: Union[RoomSettings, None] = None,
+) -> RoomSettings:
+    """Environment defaults, then room metadata, then participant metadata"""
+    settings = defaults or RoomSettings.from_env()
+    settings = settings.with_overrides(_as_metadata(room_metadata))
+    return settings.with_overrides(_as_metadata(participant_metadata))
@@ -0,0 +1,286 @@
+"""
+RPC Server
+
+Small layer over LocalParticipant.register_rpc_method for the pg.* control
+methods, so a misbehaving caller or slow handler cannot stall the audio loop.
+Every method declares:
+
+- a payload schema, checked before the handler runs
+- a per-caller token bucket (rate per second and burst)
+- a concurrency cap; calls over the cap are refused rather than queued
+- a timeout; with `shield`, a call that times out still runs to completion
+  (and keeps its concurrency slot) instead of being cancelled halfway
+- `offload`, for synchronous handlers that run in a worker thread, and
+  `cache_ttl`, to answer repeated calls from the last result
+
+Failures are raised as rtc.RpcError with the codes below, and each method
+keeps a latency histogram with outcome counters.
+
+Settings are read from environment variables:
+    RPC_DEFAULT_TIMEOUT     - seconds before a call fails (default: 10)
+    RPC_MAX_PAYLOAD_BYTES   - largest accepted payload (default: 15360)
+"""
+
+import asyncio
+import bisect
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+from structured_log import StructuredLogger
+
+logger = logging.getLogger("rpc_server")
+slog = StructuredLogger(logger)
+
+INVALID_PAYLOAD = 400
+FORBIDDEN = 403
+RATE_LIMITED = 429
+HANDLER_ERROR = 500
+BUSY = 503
+TIMED_OUT = 504
+
+LATENCY_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+def _rpc_error(code: int, message: str) -> Exception:
+    from livekit import rtc
+
+    return rtc.RpcError(code=code, message=message)
+
+
+def _matches(value: Any, types: Union[type, Tuple[type, ...]]) -> bool:
+    types = types if isinstance(types, tuple) else (types,)
+    # bool is an int subclass, so only accept it where it is asked for
+    if isinstance(value, bool) and bool not in types:
+        return False
+    return isinstance(value, types)
+
+
+@dataclass
+class Field:
+    types: Union[type, Tuple[type, ...]]
+    required: bool = False
+    choices: Optional[Tuple] = None
+
+
+@dataclass
+class RpcSettings:
+    default_timeout: float = 10.0
+    max_payload_bytes: int = 15 * 1024
+
+    @classmethod
+    def from_env(cls) -> "RpcSettings":
+        return cls(
+            default_timeout=float(os.getenv("RPC_DEFAULT_TIMEOUT", "10")),
+            max_payload_bytes=int(os.getenv("RPC_MAX_PAYLOAD_BYTES", str(15 * 1024))),
+        )
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class LatencyHistogram:
+    """Call counts per latency bucket (upper bounds in ms) and per outcome"""
+
+    def __init__(self, bounds: Tuple[float, ...] = LATENCY_BUCKETS_MS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.outcomes: Dict[str, int] = {}
+        self.total = 0
+        self.sum_ms = 0.0
+
+    def observe(self, latency_ms: float, outcome: str):
+        self.counts[bisect.bisect_left(self.bounds, latency_ms)] += 1
+        self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+        self.total += 1
+        self.sum_ms += latency_ms
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th call (inf if past the last)"""
+        if not self.total:
+            return 0.0
+        rank = q * self.total
+        seen = 0
+        for bound, count in zip(self.bounds + (float("inf"),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def snapshot(self) -> Dict:
+        return {
+            "calls": self.total,
+            "mean_ms": self.sum_ms / self.total if self.total else 0.0,
+            "p50_ms": self.quantile(0.5),
+            "p95_ms": self.quantile(0.95),
+            "p99_ms": self.quantile(0.99),
+            "buckets": {f"le_{bound}": count for bound, count in zip(self.bounds, self.counts)},
+            "outcomes": dict(self.outcomes),
+        }
+
+
+@dataclass
+class RpcMethod:
+    name: str
+    handler: Callable
+    schema: Dict[str, Field] = field(default_factory=dict)
+    rate: float = 1.0
+    burst: int = 5
+    max_concurrency: int = 1
+    timeout: Optional[float] = None
+    offload: bool = False
+    shield: bool = False
+    cache_ttl: float = 0.0
+    owner_only: bool = True
+
+    def __post_init__(self):
+        self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.histogram = LatencyHistogram()
+        self.cached: Optional[Tuple[float, Any]] = None
+
+
+class RpcServer:
+    """Register pg.* handlers behind validation, rate limits and timeouts.
+
+    Handlers receive the validated payload dict and the caller identity and
+    return something JSON-serialisable. `owner` is the participant the agent
+    serves; methods with owner_only refuse anyone else.
+    """
+
+    def __init__(
+        self,
+        local_participant,
+        owner: str,
+        settings: Optional[RpcSettings] = None,
+        create_error: Callable[[int, str], Exception] = _rpc_error,
+    ):
+        self.local_participant = local_participant
+        self.owner = owner
+        self.settings = settings or RpcSettings.from_env()
+        self.create_error = create_error
+        self.methods: Dict[str, RpcMethod] = {}
+
+    def method(self, name: str, **options):
+        """Decorator registering a handler; options are RpcMethod fields"""
+
+        def register(handler: Callable):
+            method = RpcMethod(name=name, handler=handler, **options)
+            self.methods[name] = method
+
+            async def invoke(data):
+                return await self._invoke(method, data)
+
+            self.local_participant.register_rpc_method(name)(invoke)
+            return handler
+
+        return register
+
+    def validate(self, method: RpcMethod, payload: str) -> Dict:
+        if len(payload.encode("utf-8")) > self.settings.max_payload_bytes:
+            raise self.create_error(INVALID_PAYLOAD, "payload too large")
+        if not payload:
+            data = {}
+        else:
+            try:
+                data = json.loads(payload)
+            except json.JSONDecodeError as e:
+                raise self.create_error(INVALID_PAYLOAD, f"payload is not JSON: {e.msg}")
+        if not isinstance(data, dict):
+            raise self.create_error(INVALID_PAYLOAD, "payload must be a JSON object")
+
+        for key, spec in method.schema.items():
+            if key not in data:
+                if spec.required:
+                    raise self.create_error(INVALID_PAYLOAD, f"missing field '{key}'")
+                continue
+            value = data[key]
+            if not _matches(value, spec.types):
+                raise self.create_error(INVALID_PAYLOAD, f"field '{key}' has the wrong type")
+            if spec.choices is not None and value not in spec.choices:
+                raise self.create_error(INVALID_PAYLOAD, f"field '{key}' must be one of {list(spec.choices)}")
+        return data
+
+    async def _invoke(self, method: RpcMethod, data) -> str:
+        start = time.perf_counter()
+        outcome = "ok"
+        try:
+            return await self._dispatch(method, data)
+        except Exception as e:
+            outcome = str(getattr(e, "code", HANDLER_ERROR))
+            raise
+        finally:
+            method.histogram.observe((time.perf_counter() - start) * 1000, outcome)
+
+    async def _dispatch(self, method: RpcMethod, data) -> str:
+        caller = data.caller_identity
+        if method.owner_only and caller != self.owner:
+            raise self.create_error(FORBIDDEN, "caller is not the room participant")
+
+        bucket = method.buckets.get(caller)
+        if bucket is None:
+            bucket = method.buckets[caller] = TokenBucket(method.rate, method.burst)
+        if not bucket.take():
+            raise self.create_error(RATE_LIMITED, f"rate limit for {method.name} exceeded")
+
+        payload = self.validate(method, data.payload)
+
+        if method.cache_ttl and method.cached is not None:
+            cached_at, response = method.cached
+            if time.monotonic() - cached_at < method.cache_ttl:
+                return response
+
+        if method.semaphore.locked():
+            raise self.create_error(BUSY, f"{method.name} is already running")
+
+        await method.semaphore.acquire()
+        if method.offload:
+            task = asyncio.ensure_future(asyncio.to_thread(method.handler, payload, caller))
+        else:
+            task = asyncio.ensure_future(method.handler(payload, caller))
+        timeout = method.timeout if method.timeout is not None else self.settings.default_timeout
+        try:
+            result = await asyncio.wait_for(asyncio.shield(task) if method.shield else task, timeout)
+        except asyncio.TimeoutError:
+            raise self.create_error(TIMED_OUT, f"{method.name} timed out after {timeout}s")
+        except Exception as e:
+            if hasattr(e, "code"):
+                raise
+            slog.exception("rpc_failed", method=method.name, caller=caller)
+            raise self.create_error(HANDLER_ERROR, f"{method.name} failed: {e}")
+        finally:
+            if task.done():
+                method.semaphore.release()
+            else:
+                # Shielded call still running: it keeps the slot until it ends
+                task.add_done_callback(lambda task: self._finish_shielded(method, task))
+
+        response = json.dumps(result)
+        if method.cache_ttl:
+            method.cached = (time.monotonic(), response)
+        return response
+
+    def _finish_shielded(self, method: RpcMethod, task: asyncio.Future):
+        method.semaphore.release()
+        if not task.cancelled() and task.exception() is not None:
+            slog.log(logging.ERROR, "rpc_failed_after_timeout", exc_info=task.exception(), method=method.name)
+
+    def snapshot(self) -> Dict:
+        return {name: method.histogram.snapshot() for name, method in self.methods.items()}
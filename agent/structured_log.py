@@ -0,0 +1,169 @@
+"""
+Structured Logging
+
+Logs events as single-line JSON objects instead of formatted text, so they
+can be parsed without regexes.
+
+- Lazy fields: any field value may be a zero-argument callable, called at
+  most once per event. With the ring buffer off (the default), it is only
+  called if the event is actually emitted (level enabled and not sampled
+  out), so expensive values such as `config.to_dict` cost nothing when
+  filtered.
+- Sampling: LOG_SAMPLE_RATES keeps a fraction of events per event type, per
+  room, or per "room:event" pair, e.g. "reinforcement_added=0.1,room-7=1.0".
+- Ring buffer: opt-in with LOG_RING_BUFFER_SIZE (default 0, off). Every
+  event of every module, including DEBUG ones that are not emitted, is kept
+  in one in-memory ring per process. Fields are evaluated as the event enters
+  it, so a dump shows the state at event time and the ring holds no
+  references to live objects; this is why it costs every lazy field on the
+  hot path and is off by default. dump_recent() writes it out when a session
+  errors (see dump_on_error).
+
+Events are encoded with orjson (in requirements.txt), or the stdlib json
+module when it is missing.
+"""
+
+import functools
+import json
+import logging
+import os
+import random
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple, Union
+
+# (timestamp, level, logger name, event, room, evaluated fields)
+RingEntry = Tuple[float, int, str, str, Optional[str], Dict[str, Any]]
+
+try:
+    import orjson
+
+    def _dumps(record: Dict) -> str:
+        return orjson.dumps(record, default=str).decode()
+
+except ImportError:
+    _encoder = json.JSONEncoder(separators=(",", ":"), default=str, ensure_ascii=False)
+
+    def _dumps(record: Dict) -> str:
+        return _encoder.encode(record)
+
+
+def _parse_sample_rates(value: str) -> Dict[str, float]:
+    rates = {}
+    for pair in value.split(","):
+        if "=" in pair:
+            key, rate = pair.rsplit("=", 1)
+            rates[key.strip()] = float(rate)
+    return rates
+
+
+def _evaluate(fields: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: value() if callable(value) else value for key, value in fields.items()}
+
+
+_shared_ring: Optional[Deque[RingEntry]] = None
+
+
+def shared_ring() -> Deque[RingEntry]:
+    """The process-wide ring, sized by LOG_RING_BUFFER_SIZE on first use"""
+    global _shared_ring
+    if _shared_ring is None:
+        _shared_ring = deque(maxlen=int(os.getenv("LOG_RING_BUFFER_SIZE", "0")))
+    return _shared_ring
+
+
+class StructuredLogger:
+    """Emit JSON events through a standard logging.Logger"""
+
+    def __init__(
+        self,
+        logger: logging.Logger,
+        sample_rates: Optional[Dict[str, float]] = None,
+        ring_size: Optional[int] = None,
+    ):
+        self.logger = logger
+        if sample_rates is None:
+            sample_rates = _parse_sample_rates(os.getenv("LOG_SAMPLE_RATES", ""))
+        self.sample_rates = sample_rates
+        # Loggers share the process ring unless given their own size
+        self._ring: Deque[RingEntry] = shared_ring() if ring_size is None else deque(maxlen=ring_size)
+
+    def _sample_rate(self, event: str, room: Optional[str]) -> float:
+        rates = self.sample_rates
+        if not rates:
+            return 1.0
+        if room is not None:
+            rate = rates.get(f"{room}:{event}", rates.get(room))
+            if rate is not None:
+                return rate
+        return rates.get(event, 1.0)
+
+    def log(self, level: int, event: str, room: Optional[str] = None, exc_info: Union[bool, BaseException] = False, **fields: Any):
+        timestamp = time.time()
+        if self._ring.maxlen:
+            fields = _evaluate(fields)
+            self._ring.append((timestamp, level, self.logger.name, event, room, fields))
+
+        if not self.logger.isEnabledFor(level):
+            return
+        rate = self._sample_rate(event, room)
+        if rate < 1.0 and random.random() >= rate:
+            return
+
+        self.logger.log(level, _dumps(self._record(timestamp, level, event, room, fields)), exc_info=exc_info)
+
+    def _record(self, timestamp: float, level: int, event: str, room: Optional[str], fields: Dict[str, Any]) -> Dict:
+        record = {"ts": timestamp, "level": logging.getLevelName(level), "event": event}
+        if room is not None:
+            record["room"] = room
+        record.update(_evaluate(fields))
+        return record
+
+    def debug(self, event: str, room: Optional[str] = None, **fields: Any):
+        self.log(logging.DEBUG, event, room, **fields)
+
+    def info(self, event: str, room: Optional[str] = None, **fields: Any):
+        self.log(logging.INFO, event, room, **fields)
+
+    def warning(self, event: str, room: Optional[str] = None, **fields: Any):
+        self.log(logging.WARNING, event, room, **fields)
+
+    def error(self, event: str, room: Optional[str] = None, **fields: Any):
+        self.log(logging.ERROR, event, room, **fields)
+
+    def exception(self, event: str, room: Optional[str] = None, **fields: Any):
+        """ERROR event with the current exception's traceback"""
+        self.log(logging.ERROR, event, room, exc_info=True, **fields)
+
+    def dump_recent(self, room: Optional[str] = None, reason: str = "") -> int:
+        """Write the buffered events of every module (for `room`, if given) at ERROR level"""
+        entries = [entry for entry in self._ring if room is None or entry[4] in (room, None)]
+        header = self._record(time.time(), logging.ERROR, "ring_buffer_dump", room, {"reason": reason, "count": len(entries)})
+        self.logger.error(_dumps(header))
+        for timestamp, level, name, event, entry_room, fields in entries:
+            record = self._record(timestamp, level, event, entry_room, fields)
+            record["logger"] = name
+            record["replayed"] = True
+            self.logger.error(_dumps(record))
+        return len(entries)
+
+
+def dump_on_error(slog: StructuredLogger):
+    """Decorate a coroutine method so an exception dumps the recent events of
+    the object's `room_name` before propagating"""
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(self, *args, **kwargs):
+            try:
+                return await fn(self, *args, **kwargs)
+            except Exception as e:
+                # Nested decorated calls dump the same events only once
+                if not getattr(e, "_ring_dumped", False):
+                    slog.dump_recent(getattr(self, "room_name", None), reason=f"{fn.__name__}: {e!r}")
+                    e._ring_dumped = True
+                raise
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Worker Pool Scaling Benchmark
+
+Compares jobs per second when every room shares one event loop and
+interpreter against the pinned process pool used by `start`. Job processes
+are started with "spawn", as LiveKit does, so each one imports the agent on
+its own; that start-up is timed separately, because LiveKit keeps warm
+processes ready before rooms arrive.
+
+Each job is the agent's own per-room path: main.entrypoint with the fake
+model, room and job context from fakes.py (metadata parsing, room settings,
+compiled instructions, SessionManager, memory accounting, loop watchdog, drain
+task, RPC registration), then a number of session restarts with pg.getStats
+in between, then the job's shutdown callbacks. Audio processing runs in LiveKit's native library and network I/O
+is not simulated, so this measures how the agent's Python work scales with
+cores, not a full room.
+
+Needs the agent's requirements (livekit-agents and the Google plugin).
+
+Run with:
+python tests/bench_worker_pool.py [--sessions 64] [--turns 20]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import time
+from typing import Tuple
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+AGENT_DIR = os.path.dirname(TESTS_DIR)
+for path in (AGENT_DIR, TESTS_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from fakes import (  # noqa: E402
+    FakeJobContext,
+    FakeMultimodalAgent,
+    FakeParticipant,
+    FakeRealtimeModel,
+    FakeRoom,
+)
+
+from worker_pool import _available_cpus, pin_to_cpu  # noqa: E402
+
+INSTRUCTIONS = "You are interviewing a candidate for a senior engineering role. Ask one question at a time."
+
+
+def _load_main():
+    import main
+
+    main.google.realtime.RealtimeModel = FakeRealtimeModel
+    main.MultimodalAgent = FakeMultimodalAgent
+    return main
+
+
+async def run_job(main, job_id: int, turns: int) -> int:
+    """One room from job start to shutdown; returns the restarts done"""
+    metadata = json.dumps({"instructions": INSTRUCTIONS, "max_output_tokens": 1024})
+    ctx = FakeJobContext(FakeRoom(name=f"bench-{job_id}"), FakeParticipant(f"candidate-{job_id}", metadata))
+    await main.entrypoint(ctx)
+    manager = next(session for session in main.live_sessions if session.job_context is ctx)
+
+    participant = ctx.participant
+    for turn in range(turns):
+        agent = manager.current_agent
+        agent.emit("user_started_speaking")
+        agent.emit("user_stopped_speaking")
+        agent.emit("agent_started_speaking")
+        agent.emit("agent_stopped_speaking")
+        manager.stats()
+        config = main.parse_session_config({"instructions": INSTRUCTIONS, "temperature": 0.5 + turn % 5 / 10})
+        await manager.reconfigure(ctx, participant, config)
+        # Yield, as a room waiting on audio would
+        await asyncio.sleep(0)
+
+    await ctx.run_shutdown_callbacks()
+    FakeRealtimeModel.instances.clear()
+    return turns
+
+
+def run_single_process(sessions: int, turns: int) -> float:
+    """All jobs on one event loop in this process"""
+    main = _load_main()
+
+    async def run_all():
+        await asyncio.gather(*(run_job(main, i, turns) for i in range(sessions)))
+
+    start = time.perf_counter()
+    asyncio.run(run_all())
+    return sessions / (time.perf_counter() - start)
+
+
+def _pool_initializer(ready) -> None:
+    # What a warm job process does before it takes a room: import the agent,
+    # then pin in prewarm
+    _load_main()
+    pin_to_cpu()
+    ready.wait()
+
+
+def _run_pool_job(job_id: int, turns: int) -> int:
+    return asyncio.run(run_job(_load_main(), job_id, turns))
+
+
+def run_process_pool(sessions: int, turns: int, processes: int) -> Tuple[float, float]:
+    """Jobs spread over pinned, spawned job processes, one job per process at a time.
+
+    Returns the jobs per second once every process is warm, and the seconds
+    it took to start them.
+    """
+    ctx = mp.get_context("spawn")
+    ready = ctx.Barrier(processes + 1)
+    start = time.perf_counter()
+    with ctx.Pool(processes=processes, initializer=_pool_initializer, initargs=(ready,)) as pool:
+        ready.wait()
+        startup = time.perf_counter() - start
+
+        start = time.perf_counter()
+        pool.starmap(_run_pool_job, ((i, turns) for i in range(sessions)), chunksize=1)
+        rate = sessions / (time.perf_counter() - start)
+    return rate, startup
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sessions", type=int, default=64)
+    parser.add_argument("--turns", type=int, default=20, help="session restarts per job")
+    args = parser.parse_args()
+    # Rooms sharing one loop stall it, which is the point; keep the table readable
+    logging.disable(logging.WARNING)
+
+    cpus = len(_available_cpus())
+    core_counts = sorted({1, *(2**i for i in range(1, 8) if 2**i <= cpus), cpus})
+
+    print("Worker Pool Scaling Benchmark")
+    print("=" * 50)
+    print(f"{args.sessions} jobs x {args.turns} restarts, {cpus} cores available")
+    print()
+
+    # The instruction monitor log, drain marker and CPU claims stay out of the repo
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        os.environ["AGENT_DRAIN_FILE"] = os.path.join(tmp, "bench.drain")
+        os.environ["AGENT_CPU_CLAIMS_FILE"] = os.path.join(tmp, "bench.cpus")
+
+        baseline = run_single_process(args.sessions, args.turns)
+        print(f"{'mode':<20}{'jobs/s':>12}{'speedup':>10}{'startup':>10}")
+        print(f"{'one event loop':<20}{baseline:>12.2f}{1.0:>9.2f}x{'-':>10}")
+
+        for processes in core_counts:
+            rate, startup = run_process_pool(args.sessions, args.turns, processes)
+            label = f"pool x{processes}"
+            print(f"{label:<20}{rate:>12.2f}{rate / baseline:>9.2f}x{startup:>9.2f}s")
+
+
+if __name__ == "__main__":
+    main()
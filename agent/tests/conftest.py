@@ -0,0 +1,57 @@
+import logging
+import os
+import sys
+
+import pytest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+AGENT_DIR = os.path.dirname(TESTS_DIR)
+
+for path in (AGENT_DIR, TESTS_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from fakes import (  # noqa: E402
+    FakeJobContext,
+    FakeMultimodalAgent,
+    FakeParticipant,
+    FakeRealtimeModel,
+)
+
+
+@pytest.fixture
+def monitor(tmp_path, monkeypatch):
+    """A fresh InstructionMonitor logging into a temporary directory"""
+    import instruction_monitor
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(instruction_monitor, "_instruction_monitor", None)
+    yield instruction_monitor.get_instruction_monitor()
+
+    logger = logging.getLogger("instruction_monitor")
+    for handler in list(logger.handlers):
+        handler.close()
+        logger.removeHandler(handler)
+
+
+@pytest.fixture
+def main_module(monitor, monkeypatch):
+    """main.py with the Gemini realtime model and agent replaced by fakes"""
+    pytest.importorskip("livekit.agents")
+    pytest.importorskip("livekit.plugins.google")
+    import main
+
+    FakeRealtimeModel.instances.clear()
+    monkeypatch.setattr(main.google.realtime, "RealtimeModel", FakeRealtimeModel)
+    monkeypatch.setattr(main, "MultimodalAgent", FakeMultimodalAgent)
+    return main
+
+
+@pytest.fixture
+def job_context():
+    return FakeJobContext()
+
+
+@pytest.fixture
+def participant():
+    return FakeParticipant()
@@ -0,0 +1,125 @@
+"""
+Test doubles for the realtime model, the multimodal agent and the LiveKit room.
+
+They record what SessionManager asks of them so tests can run with no
+network connection and no Gemini API key.
+"""
+
+import asyncio
+from typing import Callable, Dict, List, Optional
+
+
+class FakeRealtimeSession:
+    """Stands in for a Gemini live session"""
+
+    def __init__(self, chat_ctx):
+        self._chat_ctx = chat_ctx
+        self.set_chat_ctx_calls: List = []
+        self.connect_count = 0
+        self._main_atask = asyncio.ensure_future(self._main_task())
+
+    async def _main_task(self):
+        self.connect_count += 1
+
+    def chat_ctx_copy(self):
+        return self._chat_ctx.copy()
+
+    async def set_chat_ctx(self, chat_ctx):
+        self.set_chat_ctx_calls.append(chat_ctx)
+        self._chat_ctx = chat_ctx
+
+
+class FakeRealtimeModel:
+    """Accepts the RealtimeModel constructor arguments and keeps them"""
+
+    instances: List["FakeRealtimeModel"] = []
+
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.sessions: List[FakeRealtimeSession] = []
+        FakeRealtimeModel.instances.append(self)
+
+
+class FakeMultimodalAgent:
+    def __init__(self, model: FakeRealtimeModel, chat_ctx):
+        self.model = model
+        self.chat_ctx = chat_ctx
+        self.handlers: Dict[str, List[Callable]] = {}
+        self.replies: List[str] = []
+
+    def on(self, event: str, callback: Optional[Callable] = None):
+        def register(fn):
+            self.handlers.setdefault(event, []).append(fn)
+            return fn
+
+        return register if callback is None else register(callback)
+
+    def emit(self, event: str, *args):
+        for handler in self.handlers.get(event, []):
+            handler(*args)
+
+    def start(self, room, participant):
+        self.model.sessions.append(FakeRealtimeSession(self.chat_ctx))
+
+    def generate_reply(self, on_duplicate: str = "cancel_existing"):
+        self.replies.append(on_duplicate)
+
+
+class FakeLocalParticipant:
+    def __init__(self):
+        self.rpc_methods: Dict[str, Callable] = {}
+
+    def register_rpc_method(self, method_name: str, handler: Optional[Callable] = None):
+        def register(fn):
+            self.rpc_methods[method_name] = fn
+            return fn
+
+        return register if handler is None else register(handler)
+
+
+class FakeRoom:
+    def __init__(self, name: str = "test-room", metadata: str = ""):
+        self.name = name
+        self.metadata = metadata
+        self.local_participant = FakeLocalParticipant()
+
+
+class FakeParticipant:
+    def __init__(self, identity: str = "human", metadata: str = "{}"):
+        self.identity = identity
+        self.metadata = metadata
+
+
+class FakeJobContext:
+    """Enough of JobContext to run entrypoint: one participant is already waiting"""
+
+    def __init__(self, room: Optional[FakeRoom] = None, participant: Optional[FakeParticipant] = None):
+        self.room = room or FakeRoom()
+        self.participant = participant or FakeParticipant()
+        self.shutdown_callbacks: List[Callable] = []
+        self.shutdown_reason: Optional[str] = None
+        self.shutdown_requested = asyncio.Event()
+
+    async def connect(self, auto_subscribe=None):
+        pass
+
+    async def wait_for_participant(self) -> FakeParticipant:
+        return self.participant
+
+    def add_shutdown_callback(self, callback: Callable):
+        self.shutdown_callbacks.append(callback)
+
+    def shutdown(self, reason: str = ""):
+        self.shutdown_reason = reason
+        self.shutdown_requested.set()
+
+    async def run_shutdown_callbacks(self):
+        """What the job process does once the job ends"""
+        for callback in self.shutdown_callbacks:
+            await callback()
+
+
+class FakeRpcInvocation:
+    def __init__(self, caller_identity: str, payload: str):
+        self.caller_identity = caller_identity
+        self.payload = payload
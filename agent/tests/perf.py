@@ -0,0 +1,119 @@
+"""
+Micro-benchmark helpers.
+
+Timings are normalized by a fixed calibration workload, measured just before
+each benchmark, so a baseline recorded on one machine stays meaningful on
+another and on a host whose speed drifts during the run. A benchmark fails
+only when it is both statistically slower than the stored baseline samples
+(one-sided Mann-Whitney U test) and slower by more than the tolerance.
+
+Record a new baseline with the full requirements.txt installed, otherwise
+the benchmarks that import main.py are skipped and left out of it:
+PERF_UPDATE_BASELINE=1 python -m pytest -m perf
+
+A benchmark without a baseline fails, so a new hot path cannot go ungated.
+"""
+
+import gc
+import json
+import math
+import os
+import statistics
+import time
+from typing import Callable, Dict, List
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "perf_baseline.json")
+
+# Slowdown allowed before a significant difference counts as a regression
+TOLERANCE = float(os.getenv("PERF_TOLERANCE", "0.5"))
+SIGNIFICANCE = 0.01
+
+
+def measure(fn: Callable[[], object], repeat: int = 15, number: int = 1) -> List[float]:
+    """Return `repeat` samples of the mean seconds per call"""
+    fn()  # warm up caches and lazy imports
+    samples = []
+    # As timeit does: a GC pass landing in one sample but not another is noise
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(number):
+                fn()
+            samples.append((time.perf_counter() - start) / number)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return samples
+
+
+def _calibration_workload():
+    data = {"key": list(range(200)), "text": "x" * 200}
+    for _ in range(50):
+        json.loads(json.dumps(data))
+
+
+def calibrate() -> float:
+    """Median seconds of the reference workload on this machine"""
+    return statistics.median(measure(_calibration_workload, repeat=11, number=10))
+
+
+def mann_whitney_p_greater(current: List[float], baseline: List[float]) -> float:
+    """One-sided p-value that `current` tends to be larger than `baseline`"""
+    n1, n2 = len(current), len(baseline)
+    ranked = sorted([(v, 0) for v in current] + [(v, 1) for v in baseline])
+    ranks = [0.0] * len(ranked)
+    i = 0
+    while i < len(ranked):
+        j = i
+        while j + 1 < len(ranked) and ranked[j + 1][0] == ranked[i][0]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[k] = (i + j) / 2 + 1
+        i = j + 1
+
+    rank_sum = sum(rank for rank, (_, group) in zip(ranks, ranked) if group == 0)
+    u = rank_sum - n1 * (n1 + 1) / 2
+    mean = n1 * n2 / 2
+    sd = math.sqrt(n1 * n2 * (n1 + n2 + 1) / 12)
+    if sd == 0:
+        return 1.0
+    z = (u - mean - 0.5) / sd
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+class Baseline:
+    """Normalized samples per benchmark, stored in perf_baseline.json"""
+
+    def __init__(self, path: str = BASELINE_FILE):
+        self.path = path
+        self.update = os.getenv("PERF_UPDATE_BASELINE") == "1"
+        self.data: Dict[str, List[float]] = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.data = json.load(f)
+
+    def save(self):
+        with open(self.path, "w") as f:
+            json.dump(self.data, f, indent=2, sort_keys=True)
+            f.write("\n")
+
+    def check(self, name: str, samples: List[float], calibration: float) -> str:
+        """Compare samples with the baseline; returns a message, raises on regression"""
+        normalized = [sample / calibration for sample in samples]
+
+        if self.update:
+            self.data[name] = [round(value, 6) for value in normalized]
+            return f"{name}: baseline recorded"
+
+        baseline = self.data.get(name)
+        if baseline is None:
+            raise AssertionError(f"{name}: no baseline, record one with PERF_UPDATE_BASELINE=1")
+
+        ratio = statistics.median(normalized) / statistics.median(baseline)
+        p_value = mann_whitney_p_greater(normalized, baseline)
+        message = f"{name}: {ratio:.2f}x baseline (p={p_value:.4f})"
+        if ratio > 1 + TOLERANCE and p_value < SIGNIFICANCE:
+            raise AssertionError(f"performance regression, {message}")
+        return message
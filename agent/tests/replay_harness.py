@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Conversation Replay Harness
+
+Runs simulated interviews through main.entrypoint with no LiveKit server and
+no Gemini connection, so each room also gets its memory accounting, loop
+watchdog, drain task and shutdown callbacks. The realtime model, agent, room
+and job context are the fakes from fakes.py. Each interview replays a script
+of user and agent turns, driving the agent's speech events. The user speaks,
+then the model answers after a simulated latency, then the agent speaks.
+Every few turns the interview sends pg.updateConfig, so sessions are also
+replaced. With --drain-at, a drain is requested partway through the run.
+
+As with the real Gemini plugin, which keeps the conversation server-side,
+turns are not added to the fake session's chat context.
+
+The script is JSONL, one turn per line, alternating user and agent:
+    {"role": "user", "text": "...", "audio_ms": 2500}
+    {"role": "assistant", "text": "..."}
+Without --script, a built-in interview is used.
+
+Reported at the end, and as progress every --report-interval seconds:
+    - simulated turn time p50/p95/p99: user stops speaking -> agent starts
+      speaking, mostly the simulated model latency; the harness overhead is
+      the measured part on top of it
+    - pg.updateConfig calls refused as rate limited or busy (any other
+      failure stops the run)
+    - memory: RSS growth, growth rate after warm-up, and the top tracemalloc
+      growth sites with --trace
+    - event loop lag percentiles (LoopLagWatchdog)
+    - instruction reinforcement frequency and InstructionMonitor size
+
+Needs the agent's requirements (livekit-agents and the Google plugin).
+
+Run with:
+python tests/replay_harness.py [--sessions 200] [--duration 3600] [--speed 1.0] [--script turns.jsonl]
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter, deque
+from typing import Deque, Dict, List, Tuple
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+AGENT_DIR = os.path.dirname(TESTS_DIR)
+if AGENT_DIR not in sys.path:
+    sys.path.insert(0, AGENT_DIR)
+
+from fakes import (  # noqa: E402
+    FakeJobContext,
+    FakeMultimodalAgent,
+    FakeParticipant,
+    FakeRealtimeModel,
+    FakeRoom,
+    FakeRpcInvocation,
+)
+
+from drain import DrainSettings, request_drain  # noqa: E402
+from loop_monitor import LoopLagWatchdog, percentile  # noqa: E402
+from memory_budget import MB, current_rss  # noqa: E402
+from rpc_server import BUSY, RATE_LIMITED  # noqa: E402
+
+INSTRUCTIONS = "You are interviewing a candidate for a senior engineering role. Ask one question at a time."
+
+DEFAULT_SCRIPT = [
+    {"role": "user", "text": "Hi, thanks for having me today.", "audio_ms": 1500},
+    {"role": "assistant", "text": "Welcome! Could you start by walking me through your current role?"},
+    {"role": "user", "text": "I lead a team of five building our realtime data pipeline on Kafka and Flink.", "audio_ms": 4000},
+    {"role": "assistant", "text": "What was the hardest scaling problem you hit with that pipeline?"},
+    {"role": "user", "text": "Backpressure during traffic spikes. We added per-tenant quotas and autoscaling on lag.", "audio_ms": 5000},
+    {"role": "assistant", "text": "How did you decide on the quota limits, and what did you measure?"},
+    {"role": "user", "text": "We replayed a month of traffic and picked the p99 per tenant with some headroom.", "audio_ms": 4500},
+    {"role": "assistant", "text": "Tell me about a time you disagreed with a technical decision."},
+    {"role": "user", "text": "We were about to adopt a service mesh. I wrote up the costs and we postponed it.", "audio_ms": 4000},
+    {"role": "assistant", "text": "What would make you revisit that decision today?"},
+]
+
+
+def load_script(path: str) -> List[Dict]:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def script_turns(script: List[Dict]) -> List[Tuple[Dict, str]]:
+    """Pair each user line with the agent line that follows it"""
+    turns = []
+    for i, line in enumerate(script):
+        if line.get("role") != "user":
+            continue
+        following = script[i + 1] if i + 1 < len(script) else {}
+        reply = following.get("text", "Thank you. Let's move on.") if following.get("role") == "assistant" else "Thank you."
+        user = {"text": line["text"], "audio_ms": line.get("audio_ms", 60 * len(line["text"]))}
+        turns.append((user, reply))
+    if not turns:
+        raise ValueError("the script has no user turns")
+    return turns
+
+
+class ReplayStats:
+    def __init__(self, window: int = 100_000):
+        # Bounded, so the harness itself does not grow over a long soak
+        self.turn_ms: Deque[float] = deque(maxlen=window)
+        self.overhead_ms: Deque[float] = deque(maxlen=window)
+        self.turns = 0
+        self.reconfigures = 0
+        # pg.updateConfig calls refused by the RPC layer, by error code
+        self.refused: Counter = Counter()
+        # How each interview ended: "finished" or the job's shutdown reason
+        self.ended: Counter = Counter()
+        self.active = 0
+        self.rss_samples: List[Tuple[float, int]] = []
+
+    def record_turn(self, turn_ms: float, model_ms: float):
+        self.turns += 1
+        self.turn_ms.append(turn_ms)
+        self.overhead_ms.append(turn_ms - model_ms)
+
+    def latency(self) -> Dict[str, float]:
+        turns, overhead = sorted(self.turn_ms), sorted(self.overhead_ms)
+        return {
+            "p50": percentile(turns, 50),
+            "p95": percentile(turns, 95),
+            "p99": percentile(turns, 99),
+            "overhead_p95": percentile(overhead, 95),
+            "overhead_p99": percentile(overhead, 99),
+        }
+
+
+async def run_interview(main, index: int, args, turns: List[Tuple[Dict, str]], stats: ReplayStats, stop_at: float):
+    from livekit.agents import llm
+
+    rng = random.Random(index)
+    participant = FakeParticipant(identity=f"candidate-{index}", metadata=json.dumps({"instructions": INSTRUCTIONS}))
+    ctx = FakeJobContext(FakeRoom(name=f"replay-{index}"), participant)
+    await main.entrypoint(ctx)
+    manager = next(session for session in main.live_sessions if session.job_context is ctx)
+    update_config = ctx.room.local_participant.rpc_methods["pg.updateConfig"]
+
+    stats.active += 1
+    try:
+        # Stagger the interviews so turns do not line up across sessions
+        await asyncio.sleep(rng.uniform(0, args.turn_gap + 1))
+        for turn_index, (user, reply) in enumerate(itertools.cycle(turns)):
+            agent = manager.current_agent
+            if time.monotonic() >= stop_at or ctx.shutdown_requested.is_set() or agent is None:
+                break
+
+            agent.emit("user_started_speaking")
+            await asyncio.sleep(user["audio_ms"] / 1000 * args.speed)
+            agent.emit("user_stopped_speaking")
+            stopped_at = time.perf_counter()
+            user_msg = llm.ChatMessage.create(text=user["text"], role="user")
+            agent.emit("user_speech_committed", user_msg)
+
+            model_ms = rng.lognormvariate(math.log(args.model_latency_ms), 0.3)
+            await asyncio.sleep(model_ms / 1000)
+            agent.emit("agent_started_speaking")
+            stats.record_turn((time.perf_counter() - stopped_at) * 1000, model_ms)
+
+            await asyncio.sleep(len(reply) * args.ms_per_char / 1000 * args.speed)
+            reply_msg = llm.ChatMessage.create(text=reply, role="assistant")
+            agent.emit("agent_stopped_speaking")
+            agent.emit("agent_speech_committed", reply_msg)
+
+            if args.reconfigure_every and (turn_index + 1) % args.reconfigure_every == 0:
+                payload = json.dumps({"instructions": INSTRUCTIONS, "temperature": round(rng.uniform(0.5, 1.0), 2)})
+                try:
+                    await update_config(FakeRpcInvocation(participant.identity, payload))
+                    stats.reconfigures += 1
+                except Exception as e:
+                    if getattr(e, "code", None) not in (RATE_LIMITED, BUSY):
+                        raise
+                    stats.refused[e.code] += 1
+
+            await asyncio.sleep(rng.uniform(0, args.turn_gap) * args.speed)
+    finally:
+        stats.active -= 1
+        stats.ended[ctx.shutdown_reason or "finished"] += 1
+        await ctx.run_shutdown_callbacks()
+
+
+async def drain_at(args, started: float):
+    await asyncio.sleep(max(0.0, started + args.drain_at - time.monotonic()))
+    request_drain(DrainSettings.from_env(), "replay harness")
+
+
+async def report_progress(stats: ReplayStats, monitor, args, started: float, stop_at: float):
+    while time.monotonic() < stop_at:
+        await asyncio.sleep(min(args.report_interval, max(0.0, stop_at - time.monotonic())))
+        # The fake model class keeps every instance; drop them so only the
+        # agent's own memory is measured
+        FakeRealtimeModel.instances.clear()
+        rss = current_rss()
+        stats.rss_samples.append((time.monotonic() - started, rss))
+        latency = stats.latency()
+        print(
+            f"[{time.monotonic() - started:7.0f}s] active={stats.active} turns={stats.turns} "
+            f"simulated_p95={latency['p95']:.0f}ms overhead_p95={latency['overhead_p95']:.1f}ms rss={rss / MB:.1f}MB "
+            f"monitor_events={len(monitor.events)}/{monitor.total_events}",
+            flush=True,
+        )
+
+
+def growth_rate_mb_per_hour(samples: List[Tuple[float, int]]) -> float:
+    """RSS growth after the first half of the run, when sessions are warm"""
+    if len(samples) < 4:
+        return 0.0
+    warm = samples[len(samples) // 2:]
+    (t0, rss0), (t1, rss1) = warm[0], warm[-1]
+    return (rss1 - rss0) / MB / max(t1 - t0, 1e-9) * 3600
+
+
+async def run(args) -> Dict:
+    import main
+    from instruction_monitor import get_instruction_monitor
+
+    main.google.realtime.RealtimeModel = FakeRealtimeModel
+    main.MultimodalAgent = FakeMultimodalAgent
+
+    turns = script_turns(load_script(args.script) if args.script else DEFAULT_SCRIPT)
+    monitor = get_instruction_monitor()
+    stats = ReplayStats()
+
+    watchdog = LoopLagWatchdog.from_env(label="replay")
+    watchdog.start()
+    if args.trace:
+        tracemalloc.start(1)
+        trace_start = tracemalloc.take_snapshot()
+
+    rss_start = current_rss()
+    started = time.monotonic()
+    stop_at = started + args.duration
+    reporter = asyncio.create_task(report_progress(stats, monitor, args, started, stop_at))
+    drainer = asyncio.create_task(drain_at(args, started)) if args.drain_at is not None else None
+    await asyncio.gather(*(run_interview(main, i, args, turns, stats, stop_at) for i in range(args.sessions)))
+    reporter.cancel()
+    if drainer is not None:
+        drainer.cancel()
+    await watchdog.aclose()
+
+    FakeRealtimeModel.instances.clear()
+    rss_end = current_rss()
+    reinforcements = monitor.get_statistics()["events_by_type"].get("reinforcement_added", 0)
+    report = {
+        "sessions": args.sessions,
+        "duration_s": time.monotonic() - started,
+        "turns": stats.turns,
+        "reconfigures": stats.reconfigures,
+        "reconfigures_refused": {
+            "rate_limited": stats.refused[RATE_LIMITED],
+            "busy": stats.refused[BUSY],
+        },
+        "sessions_ended": dict(stats.ended),
+        "simulated_turn_ms": stats.latency(),
+        "loop_lag": watchdog.snapshot(),
+        "memory": {
+            "rss_start_mb": rss_start / MB,
+            "rss_end_mb": rss_end / MB,
+            "growth_mb": (rss_end - rss_start) / MB,
+            "growth_per_session_kb": (rss_end - rss_start) / 1024 / max(args.sessions, 1),
+            "warm_growth_mb_per_hour": growth_rate_mb_per_hour(stats.rss_samples),
+        },
+        "reinforcement": {
+            "events": reinforcements,
+            "per_100_turns": reinforcements / max(stats.turns, 1) * 100,
+        },
+        "instruction_monitor": {"retained_events": len(monitor.events), "total_events": monitor.total_events},
+    }
+    if args.trace:
+        growth = tracemalloc.take_snapshot().compare_to(trace_start, "lineno")
+        report["memory"]["top_growth"] = [
+            {"site": str(stat.traceback), "size_diff_kb": stat.size_diff / 1024} for stat in growth[:10]
+        ]
+        tracemalloc.stop()
+    return report
+
+
+def print_report(report: Dict):
+    latency, lag, memory = report["simulated_turn_ms"], report["loop_lag"]["lag_ms"], report["memory"]
+    refused = report["reconfigures_refused"]
+    print()
+    print("Conversation Replay Harness")
+    print("=" * 50)
+    print(f"sessions:      {report['sessions']} for {report['duration_s']:.0f}s")
+    print(f"turns:         {report['turns']} ({report['reconfigures']} reconfigures, "
+          f"{refused['rate_limited']} rate limited, {refused['busy']} busy)")
+    print("ended:         " + ", ".join(f"{count} {reason}" for reason, count in report["sessions_ended"].items()))
+    print(f"turn time:     p50={latency['p50']:.0f}ms p95={latency['p95']:.0f}ms p99={latency['p99']:.0f}ms "
+          f"(simulated speech and model latency)")
+    print(f"  overhead:    p95={latency['overhead_p95']:.1f}ms p99={latency['overhead_p99']:.1f}ms (measured)")
+    print(f"loop lag:      p50={lag['p50']:.1f}ms p95={lag['p95']:.1f}ms p99={lag['p99']:.1f}ms "
+          f"max={lag['max']:.1f}ms stalls={report['loop_lag']['stalls']}")
+    print(f"memory:        {memory['rss_start_mb']:.1f}MB -> {memory['rss_end_mb']:.1f}MB "
+          f"({memory['growth_per_session_kb']:.0f}KB per session, "
+          f"{memory['warm_growth_mb_per_hour']:+.1f}MB/h once warm)")
+    for entry in memory.get("top_growth", []):
+        print(f"  {entry['size_diff_kb']:+10.1f}KB  {entry['site']}")
+    print(f"reinforcement: {report['reinforcement']['events']} events "
+          f"({report['reinforcement']['per_100_turns']:.2f} per 100 turns)")
+    monitor = report["instruction_monitor"]
+    print(f"monitor:       {monitor['retained_events']} events retained of {monitor['total_events']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds to run")
+    parser.add_argument("--script", help="JSONL conversation script (default: built-in interview)")
+    parser.add_argument("--speed", type=float, default=1.0, help="scale for speaking time; 0.01 replays 100x faster")
+    parser.add_argument("--model-latency-ms", type=float, default=400.0, help="median simulated model latency")
+    parser.add_argument("--ms-per-char", type=float, default=60.0, help="agent speaking time per character")
+    parser.add_argument("--turn-gap", type=float, default=1.0, help="max pause between turns, seconds")
+    parser.add_argument("--reconfigure-every", type=int, default=10, help="turns between pg.updateConfig calls, 0 to never")
+    parser.add_argument("--drain-at", type=float, help="request a drain this many seconds into the run")
+    parser.add_argument("--report-interval", type=float, default=30.0)
+    parser.add_argument("--trace", action="store_true", help="report tracemalloc growth sites")
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    json_path = os.path.abspath(args.json) if args.json else None
+    if args.script:
+        args.script = os.path.abspath(args.script)
+
+    # The instruction monitor log, transcripts and drain marker stay out of the
+    # repo and away from a real worker's marker
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        os.environ["AGENT_DRAIN_FILE"] = os.path.join(tmp, "replay.drain")
+        report = asyncio.run(run(args))
+
+    print_report(report)
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+from adaptive_tuning import LatencyController, TuningBounds
+
+
+def make_controller(**kwargs) -> LatencyController:
+    bounds = TuningBounds(window_turns=4, cooldown_turns=2, **kwargs)
+    return LatencyController(bounds, initial_output_tokens=2048)
+
+
+def record(controller: LatencyController, latency_ms: float, turns: int):
+    adjustments = []
+    for _ in range(turns):
+        adjustment = controller.record_turn(latency_ms, 200)
+        if adjustment is not None:
+            adjustments.append(adjustment)
+            # The session is rebuilt with the new parameters
+            controller.applied()
+    return adjustments
+
+
+def test_no_adjustment_within_target():
+    controller = make_controller()
+    assert record(controller, 1000, 20) == []
+    assert controller.max_output_tokens == 2048
+
+
+def test_caps_tokens_then_tightens_when_over_target():
+    controller = make_controller(min_output_tokens=512)
+    adjustments = record(controller, 4000, 40)
+
+    caps = [adjustment.max_output_tokens for adjustment in adjustments]
+    assert caps == sorted(caps, reverse=True)
+    assert caps[-1] == 512
+    assert adjustments[-1].tighten_instructions
+    assert controller.clamp_output_tokens(2048) == 512
+    assert controller.clamp_output_tokens("inf") == 512
+
+
+def test_relaxes_after_latency_recovers():
+    controller = make_controller(min_output_tokens=512)
+    record(controller, 4000, 40)
+    record(controller, 100, 40)
+
+    assert not controller.tighten_instructions
+    assert controller.max_output_tokens == 2048
+
+
+def test_never_raises_above_requested_tokens():
+    controller = make_controller()
+    assert controller.clamp_output_tokens(1024) == 1024
+
+
+def test_no_new_decision_until_the_last_one_is_applied():
+    controller = make_controller()
+    first = controller.record_turn(4000, 200)
+    while first is None:
+        first = controller.record_turn(4000, 200)
+    assert controller.pending
+
+    assert all(controller.record_turn(4000, 200) is None for _ in range(20))
+    assert controller.max_output_tokens == first.max_output_tokens
+
+    controller.applied()
+    assert not controller.pending
+    assert record(controller, 4000, 4)
@@ -0,0 +1,90 @@
+import asyncio
+import threading
+
+from admission import AdmissionController, AdmissionSettings
+
+
+def make_controller(**kwargs) -> AdmissionController:
+    settings = AdmissionSettings(max_active=kwargs.pop("max_active", 1), **kwargs)
+    return AdmissionController(settings)
+
+
+def test_room_priority_from_metadata():
+    settings = AdmissionSettings(max_active=1)
+    assert settings.room_priority('{"tier": "paid"}') == 0
+    assert settings.room_priority('{"tier": "playground"}') == 10
+    assert settings.room_priority("") == 5
+    assert settings.room_priority("not json") == 5
+
+
+def test_admits_while_slots_are_free():
+    async def run():
+        controller = make_controller(max_active=2)
+        return [await controller.admit(5), await controller.admit(5)], controller
+
+    results, controller = asyncio.run(run())
+    assert results == [True, True]
+    assert controller.snapshot()["admitted"] == 2
+
+
+def test_queued_job_times_out():
+    async def run():
+        controller = make_controller(max_wait=0.05)
+        await controller.admit(5)
+        return await controller.admit(5), controller
+
+    admitted, controller = asyncio.run(run())
+    assert not admitted
+    assert controller.timed_out == 1
+    assert controller.queue_depth == 0
+
+
+def test_higher_priority_job_gets_the_next_slot():
+    async def run():
+        controller = make_controller(max_wait=1.0)
+        controller.update_active(1)
+        playground = asyncio.create_task(controller.admit(10, "playground"))
+        paid = asyncio.create_task(controller.admit(0, "paid"))
+        await asyncio.sleep(0.01)
+        assert controller.queue_depth == 2
+
+        controller.update_active(0)
+        await asyncio.sleep(0.01)
+        assert paid.done() and paid.result()
+        assert not playground.done()
+        playground.cancel()
+
+    asyncio.run(run())
+
+
+def test_full_queue_sheds_least_important_job():
+    async def run():
+        controller = make_controller(max_queue=1, max_wait=1.0)
+        controller.update_active(1)
+        playground = asyncio.create_task(controller.admit(10, "playground"))
+        await asyncio.sleep(0.01)
+
+        # Another playground room is shed straight away
+        assert not await controller.admit(10, "playground-2")
+
+        # A paid room displaces the waiting playground room
+        paid = asyncio.create_task(controller.admit(0, "paid"))
+        await asyncio.sleep(0.01)
+        assert playground.done() and not playground.result()
+        assert controller.shed == 2
+        paid.cancel()
+
+    asyncio.run(run())
+
+
+def test_report_from_another_thread_runs_on_the_loop():
+    async def run():
+        controller = make_controller(report_interval=0.0)
+        await controller.admit(5)
+        threads = []
+        controller.report = lambda: threads.append(threading.current_thread())
+        await asyncio.to_thread(controller.update_active, 1)
+        await asyncio.sleep(0.01)
+        return threads
+
+    assert asyncio.run(run()) == [threading.main_thread()]
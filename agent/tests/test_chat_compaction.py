@@ -0,0 +1,55 @@
+import itertools
+from dataclasses import dataclass, field
+
+from chat_compaction import SUMMARY_HEADER, ChatCompactor
+
+_ids = itertools.count()
+
+
+@dataclass
+class Message:
+    role: str
+    content: str
+    id: str = field(default_factory=lambda: f"item_{next(_ids)}")
+
+
+def conversation(turns: int) -> list:
+    messages = [Message("system", "You are an interviewer.")]
+    for i in range(turns):
+        messages.append(Message("user", f"answer {i}"))
+        messages.append(Message("assistant", f"question {i}"))
+    return messages
+
+
+def make_compactor(**kwargs) -> ChatCompactor:
+    return ChatCompactor(create_system_message=lambda text: Message("system", text), **kwargs)
+
+
+def test_compacted_size_does_not_grow_with_history():
+    for turns in (10, 100, 1000):
+        compacted = make_compactor(keep_last=6, summary_max_chars=500).compact(conversation(turns))
+
+        assert len(compacted) == 8
+        assert compacted[0].content == "You are an interviewer."
+        assert compacted[1].content.startswith(SUMMARY_HEADER)
+        assert len(compacted[1].content) <= 500 + len(SUMMARY_HEADER) + 1
+        assert compacted[-1].content == f"question {turns - 1}"
+
+
+def test_short_history_is_kept_as_is():
+    messages = conversation(2)
+    assert make_compactor(keep_last=10).compact(messages) == messages
+
+
+def test_compacting_again_keeps_the_earlier_summary():
+    compactor = make_compactor(keep_last=4, summary_max_chars=10_000)
+    messages = compactor.compact(conversation(10))
+    summary = messages[1].content
+
+    messages += conversation(3)[1:]
+    compacted = compactor.compact(messages)
+
+    assert compacted[0].content == "You are an interviewer."
+    assert compacted[1].content.startswith(summary)
+    assert compacted[1].content.count("\n") > summary.count("\n")
+    assert [m.content for m in compactor.compact(compacted)] == [m.content for m in compacted]
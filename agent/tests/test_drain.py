@@ -0,0 +1,103 @@
+import asyncio
+import json
+import os
+import signal
+import time
+
+from drain import (
+    DrainSettings,
+    WorkerDrain,
+    clear_drain,
+    drain_on_sigterm,
+    drain_state,
+    request_drain,
+    wait_for_drain,
+)
+
+
+def make_settings(tmp_path, **kwargs) -> DrainSettings:
+    return DrainSettings(marker_path=str(tmp_path / "agent.drain"), **kwargs)
+
+
+def test_drain_request_is_shared_and_kept_until_cleared(tmp_path):
+    settings = make_settings(tmp_path, timeout=30)
+    assert drain_state(settings) is None
+
+    first = request_drain(settings, "SIGUSR1")
+    second = request_drain(settings, "rpc")
+    assert second == first == drain_state(settings)
+    assert first["reason"] == "SIGUSR1"
+    assert first["deadline"] - first["requested_at"] == 30
+
+    clear_drain(settings)
+    assert drain_state(settings) is None
+
+
+def test_worker_reports_sessions_affected_once_jobs_finish(tmp_path):
+    settings = make_settings(tmp_path)
+    drain = WorkerDrain(settings)
+
+    drain.update(3)
+    assert not drain.draining
+
+    request_drain(settings, "SIGUSR1")
+    drain.update(3)
+    drain.update(1)
+    assert drain.draining
+
+    drain.update(0)
+    with open(settings.report_path) as f:
+        report = json.load(f)
+    assert report["drained"] is True
+    assert report["sessions_affected"] == 3
+    assert report["duration_s"] >= 0
+
+    # The marker is gone, so the worker takes jobs again
+    assert drain_state(settings) is None
+    assert not drain.draining
+
+
+def test_sigterm_writes_the_marker_before_the_previous_handler(tmp_path):
+    settings = make_settings(tmp_path)
+    seen = []
+    original = signal.signal(signal.SIGTERM, lambda signum, frame: seen.append(drain_state(settings)))
+    try:
+        drain_on_sigterm(settings)
+        os.kill(os.getpid(), signal.SIGTERM)
+    finally:
+        signal.signal(signal.SIGTERM, original)
+
+    assert seen and seen[0]["reason"] == "SIGTERM"
+
+
+def test_sessions_see_the_drain_and_its_deadline(tmp_path):
+    settings = make_settings(tmp_path, timeout=5, poll_interval=0.01)
+
+    async def run():
+        waiter = asyncio.ensure_future(wait_for_drain(settings))
+        await asyncio.sleep(0.05)
+        assert not waiter.done()
+        request_drain(settings, "rpc")
+        return await asyncio.wait_for(waiter, 1)
+
+    state = asyncio.run(run())
+    assert state["reason"] == "rpc"
+    assert 0 < state["deadline"] - time.time() <= 5
+
+
+def test_session_waits_for_the_agent_to_finish_its_turn(main_module, job_context, participant):
+    async def run():
+        manager = main_module.SessionManager(main_module.parse_session_config({"instructions": "Be brief"}))
+        manager.setup_session(job_context, participant)
+        agent = manager.current_agent
+        agent.emit("agent_started_speaking")
+
+        drain = asyncio.ensure_future(manager.drain(time.time() + 5))
+        await asyncio.sleep(0.05)
+        assert not drain.done()
+        agent.emit("agent_stopped_speaking")
+        return manager, await drain
+
+    manager, result = asyncio.run(run())
+    assert result["at_turn_boundary"] is True
+    assert manager.current_agent is None
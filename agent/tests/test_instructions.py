@@ -0,0 +1,269 @@
+import asyncio
+import json
+import os
+import threading
+
+import pytest
+from fakes import FakeRealtimeModel, FakeRpcInvocation
+
+from custom_instructions import (
+    CUSTOM_INSTRUCTIONS,
+    INSTRUCTION_PRESETS,
+    get_enhanced_instructions,
+    get_preset_instructions,
+)
+
+
+def test_enhanced_instructions_include_all_sections():
+    instructions = get_enhanced_instructions()
+    assert CUSTOM_INSTRUCTIONS.strip()[:200] in instructions
+    assert "BEHAVIORAL CONSTRAINTS:" in instructions
+    assert "YOUR EXPERTISE AREAS:" in instructions
+
+
+@pytest.mark.parametrize("preset_name", list(INSTRUCTION_PRESETS))
+def test_preset_instructions(preset_name):
+    preset = INSTRUCTION_PRESETS[preset_name]
+    assert {"instructions", "context", "constraints"} <= set(preset)
+
+    instructions = get_preset_instructions(preset_name)
+    assert preset["instructions"].strip() in instructions
+    for constraint in preset["constraints"]:
+        assert f"- {constraint}" in instructions
+
+
+def test_unknown_preset_falls_back_to_enhanced_instructions():
+    assert get_preset_instructions("no_such_preset") == get_enhanced_instructions()
+
+
+def test_instruction_monitor_import_has_no_side_effects(tmp_path, monkeypatch):
+    import importlib
+
+    import instruction_monitor
+
+    monkeypatch.chdir(tmp_path)
+    importlib.reload(instruction_monitor)
+    assert os.listdir(tmp_path) == []
+
+
+def test_instruction_monitor_statistics(monitor):
+    monitor.log_session_start("alice", "custom", "preview")
+    monitor.log_session_start("bob", "job_interview", "preview")
+    monitor.log_reinforcement_added("alice", 20, "preview")
+    monitor.log_reinforcement_added("alice", 40, "preview")
+    monitor.log_config_change("bob", "job_interview", "custom")
+
+    stats = monitor.get_statistics()
+    assert stats["total_events"] == 5
+    assert stats["events_by_type"] == {
+        "session_started": 2,
+        "reinforcement_added": 2,
+        "config_changed": 1,
+    }
+    assert stats["sessions_by_preset"] == {"custom": 1, "job_interview": 1}
+    assert stats["reinforcements_per_session"] == {"alice": 2}
+
+
+def test_instruction_monitor_keeps_recent_events_but_counts_all(monitor):
+    from instruction_monitor import InstructionMonitor
+
+    bounded = InstructionMonitor(log_file=monitor.log_file, max_events=10)
+    for i in range(100):
+        bounded.log_reinforcement_added(f"participant-{i % 4}", i, "preview")
+
+    assert len(bounded.events) == 10
+    assert bounded.events[-1].details["message_count"] == 99
+    stats = bounded.get_statistics()
+    assert stats["total_events"] == 100
+    assert stats["reinforcements_per_session"] == {f"participant-{i}": 25 for i in range(4)}
+
+
+def test_instruction_monitor_logs_each_event_once(monitor):
+    from instruction_monitor import InstructionMonitor
+
+    # A second monitor must not attach a second handler to the same file
+    other = InstructionMonitor()
+    monitor.log_session_start("alice", "custom", "preview")
+    other.log_session_start("bob", "custom", "preview")
+
+    with open(monitor.log_file) as f:
+        records = [json.loads(line) for line in f.read().splitlines()]
+    assert [record["participant_id"] for record in records] == ["alice", "bob"]
+    assert records[0]["event"] == "session_started"
+    assert records[0]["preset"] == "custom"
+
+
+def test_parse_session_config_defaults(main_module):
+    config = main_module.parse_session_config({})
+    assert config.temperature == 0.8
+    assert config.max_response_output_tokens == 2048
+    assert config.modalities == ["AUDIO"]
+
+
+def test_parse_session_config_values(main_module):
+    config = main_module.parse_session_config(
+        {
+            "instructions": "Test instructions",
+            "voice": "Puck",
+            "temperature": "0.5",
+            "max_output_tokens": "inf",
+            "modalities": "text_and_audio",
+        }
+    )
+    assert config.instructions == "Test instructions"
+    assert config.temperature == 0.5
+    assert config.max_response_output_tokens == "inf"
+    assert config.modalities == ["TEXT", "AUDIO"]
+
+
+def test_session_config_equality_ignores_api_key(main_module):
+    a = main_module.parse_session_config({"instructions": "x"})
+    b = main_module.parse_session_config({"instructions": "x"})
+    b.gemini_api_key = "other"
+    assert a == b
+
+
+def test_create_initial_chat_context(main_module):
+    chat_ctx = main_module.create_initial_chat_context("Test instructions for chat context")
+    assert [msg.role for msg in chat_ctx.messages] == ["system", "user"]
+    assert "Test instructions for chat context" in chat_ctx.messages[0].content
+
+
+def test_add_instruction_reinforcement(main_module, monitor):
+    from livekit.agents import llm
+
+    manager = main_module.SessionManager(main_module.parse_session_config({"instructions": "Be brief"}))
+    chat_ctx = llm.ChatContext()
+    for i in range(manager.settings.reinforcement_interval + 1):
+        chat_ctx.append(text=f"message {i}", role="user")
+
+    manager.add_instruction_reinforcement(chat_ctx, "alice")
+    assert chat_ctx.messages[-1].role == "system"
+    assert "Stay within your role" in chat_ctx.messages[-1].content
+
+    # A recent reinforcement suppresses another one
+    count = len(chat_ctx.messages)
+    manager.add_instruction_reinforcement(chat_ctx, "alice")
+    assert len(chat_ctx.messages) == count
+    assert monitor.get_statistics()["reinforcements_per_session"] == {"alice": 1}
+
+
+def test_setup_session_with_fake_model(main_module, job_context, participant):
+    async def run():
+        manager = main_module.SessionManager(main_module.parse_session_config({"instructions": "Be brief"}))
+        manager.setup_session(job_context, participant)
+        return manager
+
+    manager = asyncio.run(run())
+    model = FakeRealtimeModel.instances[-1]
+    assert manager.current_model is model
+    assert model.kwargs["max_output_tokens"] == 2048
+    assert manager.current_agent.replies == ["cancel_existing"]
+    assert "pg.updateConfig" in job_context.room.local_participant.rpc_methods
+
+
+def test_update_config_rpc_reconfigures_session(main_module, job_context, participant):
+    async def run():
+        manager = main_module.SessionManager(main_module.parse_session_config({"instructions": "Be brief"}))
+        manager.setup_session(job_context, participant)
+        update_config = job_context.room.local_participant.rpc_methods["pg.updateConfig"]
+
+        payload = json.dumps({"instructions": "Be brief", "temperature": 0.3})
+        changed = json.loads(await update_config(FakeRpcInvocation(participant.identity, payload)))
+        unchanged = json.loads(await update_config(FakeRpcInvocation(participant.identity, payload)))
+        stranger = json.loads(await update_config(FakeRpcInvocation("stranger", payload)))
+        return manager, changed, unchanged, stranger
+
+    manager, changed, unchanged, stranger = asyncio.run(run())
+    assert changed == {"changed": True}
+    assert unchanged == {"changed": False}
+    assert stranger == {"changed": False}
+    assert manager.current_config.temperature == 0.3
+    assert len(FakeRealtimeModel.instances) == 2
+    assert manager.current_model.sessions[0].set_chat_ctx_calls
+
+
+def test_switch_preset_rpc_restarts_with_the_new_preset(main_module, job_context, participant):
+    async def run():
+        manager = main_module.SessionManager(main_module.parse_session_config({"instructions": "Be brief"}))
+        manager.setup_session(job_context, participant)
+        methods = job_context.room.local_participant.rpc_methods
+
+        payload = json.dumps({"preset": "job_interview"})
+        switched = json.loads(await methods["pg.switchPreset"](FakeRpcInvocation(participant.identity, payload)))
+        stats = json.loads(await methods["pg.getStats"](FakeRpcInvocation(participant.identity, "")))
+        return manager, switched, stats
+
+    manager, switched, stats = asyncio.run(run())
+    assert switched == {"changed": True}
+    assert manager.settings.preset == "job_interview"
+    assert len(FakeRealtimeModel.instances) == 2
+    assert stats["preset"] == "job_interview"
+    assert stats["rpc"]["pg.switchPreset"]["outcomes"] == {"ok": 1}
+
+
+def test_get_stats_runs_off_the_loop_and_flush_history_trims(main_module, job_context, participant, monkeypatch):
+    threads = []
+
+    async def run():
+        manager = main_module.SessionManager(main_module.parse_session_config({"instructions": "Be brief"}))
+        manager.setup_session(job_context, participant)
+        stats = manager.stats
+        monkeypatch.setattr(manager, "stats", lambda: threads.append(threading.current_thread()) or stats())
+        methods = job_context.room.local_participant.rpc_methods
+
+        session = manager.current_model.sessions[0]
+        for i in range(10):
+            session._chat_ctx.append(text=f"answer {i}", role="user")
+        before = len(session._chat_ctx.messages)
+        flushed = json.loads(
+            await methods["pg.flushHistory"](FakeRpcInvocation(participant.identity, json.dumps({"keep_last": 2})))
+        )
+        await methods["pg.getStats"](FakeRpcInvocation(participant.identity, ""))
+        return before, flushed, [m.content for m in session._chat_ctx.messages]
+
+    before, flushed, contents = asyncio.run(run())
+    assert flushed == {"removed": before - 3}
+    assert contents[1:] == ["answer 8", "answer 9"]
+    assert threads and threads[0] is not threading.main_thread()
+
+
+def test_adaptive_adjustment_waits_for_the_next_reconfigure(main_module, job_context, participant, monkeypatch):
+    monkeypatch.setenv("ENABLE_ADAPTIVE_TUNING", "true")
+
+    async def run():
+        manager = main_module.SessionManager(main_module.parse_session_config({"instructions": "Be brief"}))
+        manager.setup_session(job_context, participant)
+
+        controller = manager.latency_controller
+        controller.max_output_tokens = 512
+        controller.pending = True
+        manager.apply_adjustment(main_module.Adjustment(512, False, 4000.0, 300.0, "p95 over target"), "user-1")
+        await asyncio.sleep(0.05)
+        reconnected = len(FakeRealtimeModel.instances) > 1
+
+        config = main_module.parse_session_config({"instructions": "Be brief", "temperature": 0.3})
+        await manager.reconfigure(job_context, participant, config)
+        return reconnected, controller.pending
+
+    reconnected, pending = asyncio.run(run())
+    assert not reconnected
+    assert not pending
+    assert len(FakeRealtimeModel.instances) == 2
+    assert FakeRealtimeModel.instances[-1].kwargs["max_output_tokens"] == 512
+
+
+def test_rooms_with_the_same_preset_share_compiled_instructions(main_module):
+    from room_settings import RoomSettings
+
+    config = main_module.parse_session_config({"instructions": "Be brief"})
+    settings = RoomSettings(preset="job_interview", strict_mode=True)
+    first = main_module.SessionManager(config, settings).create_enhanced_instructions("Be brief")
+    second = main_module.SessionManager(config, settings).create_enhanced_instructions("Be brief")
+    assert first is second
+    assert "CRITICAL BEHAVIORAL ENFORCEMENT" in first
+
+    relaxed = RoomSettings(preset="job_interview", strict_mode=False)
+    assert "CRITICAL BEHAVIORAL ENFORCEMENT" not in main_module.SessionManager(
+        config, relaxed
+    ).create_enhanced_instructions("Be brief")
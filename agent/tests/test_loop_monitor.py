@@ -0,0 +1,92 @@
+import asyncio
+import os
+import threading
+
+from loop_monitor import LoopLagWatchdog, start_loop_monitoring
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_watchdog(clock: FakeClock) -> LoopLagWatchdog:
+    return LoopLagWatchdog(interval=0.1, threshold=0.05, label="room-1", clock=clock)
+
+
+def test_lag_past_the_threshold_counts_as_a_stall():
+    clock = FakeClock()
+    watchdog = make_watchdog(clock)
+
+    started = clock.now
+    clock.now += 0.12
+    assert round(watchdog._record_lag(started), 3) == 0.02
+    assert watchdog.stall_count == 0
+
+    started = clock.now
+    clock.now += 0.35
+    assert round(watchdog._record_lag(started), 3) == 0.25
+    assert watchdog.stall_count == 1
+    assert watchdog.snapshot()["lag_ms"]["max"] == watchdog.percentiles()["max"] > 249
+
+
+def test_stalled_loop_stack_is_captured_once_per_stall():
+    clock = FakeClock()
+    watchdog = make_watchdog(clock)
+    release = threading.Event()
+
+    def blocking_callback():
+        release.wait(5)
+
+    loop_thread = threading.Thread(target=blocking_callback)
+    loop_thread.start()
+    watchdog._loop_thread_id = loop_thread.ident
+    try:
+        clock.now += 0.1
+        watchdog._check_stall()
+        assert watchdog.last_stall_stack is None
+
+        clock.now += 0.2
+        watchdog._check_stall()
+        stack = watchdog.last_stall_stack
+        assert "blocking_callback" in stack
+
+        watchdog.last_stall_stack = "kept"
+        watchdog._check_stall()
+        assert watchdog.last_stall_stack == "kept"
+    finally:
+        release.set()
+        loop_thread.join()
+
+    # The sample that ends the stall reports it and re-arms the capture
+    watchdog._record_lag(clock.now - 0.3)
+    assert watchdog.stall_count == 1
+    assert watchdog.last_stall_stack is None
+    assert not watchdog._stall_captured
+
+
+def test_profiler_runs_only_for_the_chosen_room(tmp_path, monkeypatch):
+    monkeypatch.setenv("LOOP_PROFILE_ROOM", "room/../a b")
+    monkeypatch.setenv("LOOP_PROFILE_DIR", str(tmp_path))
+    monkeypatch.setenv("LOOP_PROFILE_INTERVAL_MS", "1")
+
+    async def run(room_name):
+        watchdog = start_loop_monitoring(room_name)
+        profiled = watchdog._profiler is not None
+        await asyncio.sleep(0.05)
+        await watchdog.aclose()
+        return profiled
+
+    assert not asyncio.run(run("room-2"))
+    assert os.listdir(tmp_path) == []
+
+    assert asyncio.run(run("room/../a b"))
+    (name,) = os.listdir(tmp_path)
+    assert name.startswith("loop_profile_room_.._a_b_") and name.endswith(".folded")
+
+    monkeypatch.setenv("LOOP_PROFILE_ROOM", "*")
+    assert asyncio.run(run("room-3"))
+    assert len(os.listdir(tmp_path)) == 2
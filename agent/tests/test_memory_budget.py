@@ -0,0 +1,95 @@
+import asyncio
+import tracemalloc
+from unittest.mock import patch
+
+from admission import AdmissionController, AdmissionSettings
+from memory_budget import MB, MemorySettings, SessionMemory, current_rss
+
+
+def test_tracing_is_sampled_per_room_and_stopped_at_close():
+    async def run(sample):
+        memory = SessionMemory("room-1", MemorySettings(trace=True, trace_sample_rate=0.5, check_interval=3600))
+        with patch("memory_budget.random.random", return_value=sample):
+            memory.start()
+        traced = (memory.traced, tracemalloc.is_tracing())
+        await memory.check()
+        top = memory.snapshot()["top_allocations"]
+        await memory.aclose()
+        return traced, top
+
+    assert asyncio.run(run(0.9)) == ((False, False), [])
+    traced, top = asyncio.run(run(0.1))
+    assert traced == (True, True)
+    assert top
+    assert not tracemalloc.is_tracing()
+
+
+def test_over_budget_session_compacts_history():
+    compactions = []
+
+    async def compact():
+        compactions.append(True)
+        return 12
+
+    async def run():
+        memory = SessionMemory("room-1", MemorySettings(session_budget_bytes=1), on_over_budget=compact)
+        memory.baseline_rss = 0
+        await memory.check()
+        return memory
+
+    memory = asyncio.run(run())
+    assert current_rss() > 0
+    assert compactions == [True]
+    assert memory.snapshot()["compactions"] == 1
+    assert memory.session_bytes == memory.rss
+
+
+def test_compaction_is_rearmed_only_after_usage_falls():
+    compactions = []
+
+    async def compact():
+        compactions.append(True)
+        return 12
+
+    async def run():
+        memory = SessionMemory("room-1", MemorySettings(session_budget_bytes=100 * MB), on_over_budget=compact)
+        memory.baseline_rss = 0
+        for rss in (120, 130, 125, 95, 110, 80, 110):
+            memory.rss = rss * MB
+            with patch("memory_budget.current_rss", return_value=memory.rss):
+                await memory.check()
+        return memory
+
+    memory = asyncio.run(run())
+    assert len(compactions) == 2
+    assert memory.over_budget == 5
+
+
+def test_admission_refuses_rooms_without_memory_headroom():
+    class Room:
+        name = "room-1"
+        metadata = ""
+
+    class Request:
+        room = Room()
+        outcome = None
+
+        async def accept(self):
+            self.outcome = "accepted"
+
+        async def reject(self):
+            self.outcome = "rejected"
+
+    headroom = [False]
+    controller = AdmissionController(AdmissionSettings(max_active=4), memory_check=lambda: headroom[0])
+
+    async def run():
+        refused, admitted = Request(), Request()
+        await controller.request_fnc(refused)
+        headroom[0] = True
+        await controller.request_fnc(admitted)
+        return refused.outcome, admitted.outcome
+
+    assert asyncio.run(run()) == ("rejected", "accepted")
+    assert controller.snapshot()["refused_memory"] == 1
+    assert MemorySettings(session_budget_bytes=0).has_headroom()
@@ -0,0 +1,163 @@
+"""
+Micro-benchmarks for the functions on the session setup and per-turn paths.
+
+Each benchmark is compared against tests/perf_baseline.json (see perf.py).
+"""
+
+import os
+
+import pytest
+from perf import Baseline, calibrate, measure
+
+pytestmark = pytest.mark.perf
+
+MONITOR_EVENTS = int(os.getenv("PERF_MONITOR_EVENTS", "1000000"))
+CHAT_MESSAGES = int(os.getenv("PERF_CHAT_MESSAGES", "10000"))
+
+
+@pytest.fixture
+def calibration():
+    return calibrate()
+
+
+@pytest.fixture(scope="session")
+def baseline():
+    baseline = Baseline()
+    yield baseline
+    if baseline.update:
+        baseline.save()
+
+
+def monitor_events(count: int, offset: int = 0):
+    from instruction_monitor import InstructionEvent
+
+    event_types = [
+        ("session_started", {"preset": "custom", "instructions_preview": "..."}),
+        ("reinforcement_added", {"message_count": 20, "instruction_preview": "..."}),
+        ("config_changed", {"old_preset": "custom", "new_preset": "job_interview"}),
+    ]
+    timestamp = "2025-01-01T00:00:00"
+    return [
+        InstructionEvent(
+            timestamp=timestamp,
+            event_type=event_types[i % 3][0],
+            details=event_types[i % 3][1],
+            participant_id=f"participant-{i % 1000}",
+        )
+        for i in range(offset, offset + count)
+    ]
+
+
+@pytest.fixture(scope="module")
+def large_monitor(tmp_path_factory):
+    from instruction_monitor import InstructionMonitor
+
+    monitor = InstructionMonitor(log_file=str(tmp_path_factory.mktemp("perf") / "perf.log"))
+    for event in monitor_events(MONITOR_EVENTS):
+        monitor._remember(event)
+    return monitor
+
+
+def test_get_preset_instructions_cached(baseline, calibration):
+    from custom_instructions import INSTRUCTION_PRESETS, get_preset_instructions
+
+    def run():
+        for preset_name in INSTRUCTION_PRESETS:
+            get_preset_instructions(preset_name)
+
+    samples = measure(run, number=1000)
+    print(baseline.check("get_preset_instructions_cached", samples, calibration))
+
+
+def test_get_preset_instructions_uncached(baseline, calibration):
+    from custom_instructions import INSTRUCTION_PRESETS, get_preset_instructions
+
+    build = get_preset_instructions.__wrapped__
+
+    def run():
+        for preset_name in INSTRUCTION_PRESETS:
+            build(preset_name)
+
+    samples = measure(run, number=200)
+    print(baseline.check("get_preset_instructions_uncached", samples, calibration))
+
+
+def test_get_enhanced_instructions_uncached(baseline, calibration):
+    from custom_instructions import get_enhanced_instructions
+
+    samples = measure(get_enhanced_instructions.__wrapped__, number=500)
+    print(baseline.check("get_enhanced_instructions_uncached", samples, calibration))
+
+
+def test_monitor_record_after_1m_events(large_monitor, baseline, calibration):
+    # Recording must stay O(1) however many events the monitor has seen
+    events = monitor_events(10_000, offset=MONITOR_EVENTS)
+
+    def run():
+        for event in events:
+            large_monitor._remember(event)
+
+    samples = measure(run, repeat=10)
+    assert len(large_monitor.events) == large_monitor.events.maxlen
+    assert large_monitor.get_statistics()["total_events"] == MONITOR_EVENTS + 11 * len(events)
+    print(baseline.check("monitor_record_10k_after_1m", samples, calibration))
+
+
+def test_get_statistics_after_1m_events(large_monitor, baseline, calibration):
+    # pg.getStats reads the running counters, never the retained events
+    samples = measure(large_monitor.get_statistics, number=1000)
+    statistics = large_monitor.get_statistics()
+    assert statistics["total_events"] >= MONITOR_EVENTS
+    assert sum(statistics["events_by_type"].values()) == statistics["total_events"]
+    print(baseline.check("get_statistics_after_1m", samples, calibration))
+
+
+def test_parse_session_config(main_module, baseline, calibration):
+    payload = {
+        "instructions": "Benchmark instructions",
+        "voice": "Puck",
+        "temperature": 0.7,
+        "max_output_tokens": 1024,
+        "modalities": "text_and_audio",
+    }
+    samples = measure(lambda: main_module.parse_session_config(payload), number=2000)
+    print(baseline.check("parse_session_config", samples, calibration))
+
+
+def test_create_initial_chat_context(main_module, baseline, calibration):
+    from custom_instructions import get_enhanced_instructions
+
+    instructions = get_enhanced_instructions()
+    samples = measure(lambda: main_module.create_initial_chat_context(instructions), number=500)
+    print(baseline.check("create_initial_chat_context", samples, calibration))
+
+
+def test_add_instruction_reinforcement_large_context(main_module, baseline, calibration):
+    from livekit.agents import llm
+
+    config = main_module.parse_session_config({"instructions": "Benchmark instructions"})
+    manager = main_module.SessionManager(config)
+    chat_ctx = llm.ChatContext()
+    for i in range(CHAT_MESSAGES):
+        chat_ctx.append(text=f"message {i}", role="user" if i % 2 else "assistant")
+
+    def run():
+        manager.add_instruction_reinforcement(chat_ctx, "human")
+        # Drop the reinforcement again so every call takes the append path
+        chat_ctx.messages.pop()
+
+    samples = measure(run, number=50)
+    assert len(chat_ctx.messages) == CHAT_MESSAGES
+    print(baseline.check("add_instruction_reinforcement_10k", samples, calibration))
+
+
+def test_import_time_within_budget():
+    import bench_import_time
+
+    budget = bench_import_time.load_budget()
+    problems = bench_import_time.failures(bench_import_time.measure(runs=9), budget)
+    if problems:
+        # A burst of load on a shared host can push one median over; a real
+        # regression is over again when measured a second time
+        problems = bench_import_time.failures(bench_import_time.measure(runs=9), budget)
+    assert problems == []
@@ -0,0 +1,44 @@
+import json
+
+from room_settings import RoomSettings, resolve_room_settings
+
+
+def test_defaults_from_environment(monkeypatch):
+    monkeypatch.setenv("INSTRUCTION_PRESET", "sales_mindset")
+    monkeypatch.setenv("STRICT_INSTRUCTION_MODE", "false")
+    monkeypatch.setenv("REINFORCEMENT_INTERVAL", "30")
+
+    settings = resolve_room_settings("", "")
+    assert settings == RoomSettings(
+        preset="sales_mindset",
+        strict_mode=False,
+        reinforcement_enabled=True,
+        reinforcement_interval=30,
+    )
+
+
+def test_participant_metadata_overrides_room_metadata():
+    room = json.dumps({"instruction_preset": "job_interview", "reinforcement_interval": 20})
+    participant = {"instruction_preset": "technical_deep_dive", "strict_instruction_mode": False}
+
+    settings = resolve_room_settings(room, participant, defaults=RoomSettings())
+    assert settings.preset == "technical_deep_dive"
+    assert settings.strict_mode is False
+    assert settings.reinforcement_interval == 20
+
+
+def test_invalid_values_keep_defaults():
+    participant = {"instruction_preset": "no_such_preset", "reinforcement_interval": "often"}
+
+    settings = resolve_room_settings("not json", participant, defaults=RoomSettings())
+    assert settings == RoomSettings()
+
+
+def test_reinforcement_interval_below_one_is_rejected(monkeypatch):
+    monkeypatch.setenv("REINFORCEMENT_INTERVAL", "0")
+    assert RoomSettings.from_env().reinforcement_interval == 15
+
+    room = {"reinforcement_interval": 20}
+    for interval in (0, -5, "-1"):
+        settings = resolve_room_settings(room, {"reinforcement_interval": interval}, defaults=RoomSettings())
+        assert settings.reinforcement_interval == 20
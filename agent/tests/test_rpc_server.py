@@ -0,0 +1,139 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+from fakes import FakeLocalParticipant, FakeRpcInvocation
+
+from rpc_server import (
+    BUSY,
+    FORBIDDEN,
+    INVALID_PAYLOAD,
+    RATE_LIMITED,
+    TIMED_OUT,
+    Field,
+    RpcServer,
+    RpcSettings,
+)
+
+
+class RpcError(Exception):
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+
+
+def make_server():
+    local = FakeLocalParticipant()
+    server = RpcServer(local, owner="human", settings=RpcSettings(), create_error=RpcError)
+    return server, local.rpc_methods
+
+
+def call(methods, name, payload, caller="human"):
+    return methods[name](FakeRpcInvocation(caller, payload))
+
+
+def test_payloads_are_validated_before_the_handler_runs():
+    server, methods = make_server()
+    calls = []
+
+    @server.method("pg.mute", schema={"muted": Field(bool, required=True)}, burst=10)
+    async def mute(payload, caller):
+        calls.append(payload)
+        return {"muted": payload["muted"]}
+
+    async def run():
+        codes = []
+        for payload in ("not json", "[]", "{}", json.dumps({"muted": 1})):
+            with pytest.raises(RpcError) as error:
+                await call(methods, "pg.mute", payload)
+            codes.append(error.value.code)
+        return codes, json.loads(await call(methods, "pg.mute", json.dumps({"muted": True})))
+
+    codes, result = asyncio.run(run())
+    assert codes == [INVALID_PAYLOAD] * 4
+    assert result == {"muted": True}
+    assert calls == [{"muted": True}]
+    assert server.snapshot()["pg.mute"]["outcomes"] == {str(INVALID_PAYLOAD): 4, "ok": 1}
+
+
+def test_rate_limit_is_per_caller_and_owner_only_refuses_others():
+    server, methods = make_server()
+
+    @server.method("pg.ping", rate=0.01, burst=2, owner_only=False)
+    async def ping(payload, caller):
+        return "pong"
+
+    @server.method("pg.secret")
+    async def secret(payload, caller):
+        return "ok"
+
+    async def run():
+        await call(methods, "pg.ping", "")
+        await call(methods, "pg.ping", "")
+        with pytest.raises(RpcError) as limited:
+            await call(methods, "pg.ping", "")
+        other = await call(methods, "pg.ping", "", caller="other")
+        with pytest.raises(RpcError) as forbidden:
+            await call(methods, "pg.secret", "", caller="other")
+        return limited.value.code, other, forbidden.value.code
+
+    assert asyncio.run(run()) == (RATE_LIMITED, '"pong"', FORBIDDEN)
+
+
+def test_concurrency_cap_and_timeout():
+    server, methods = make_server()
+
+    @server.method("pg.slow", timeout=0.05)
+    async def slow(payload, caller):
+        await asyncio.sleep(1)
+
+    async def run():
+        first = asyncio.ensure_future(call(methods, "pg.slow", ""))
+        await asyncio.sleep(0)
+        with pytest.raises(RpcError) as busy:
+            await call(methods, "pg.slow", "")
+        with pytest.raises(RpcError) as timed_out:
+            await first
+        return busy.value.code, timed_out.value.code
+
+    assert asyncio.run(run()) == (BUSY, TIMED_OUT)
+
+
+def test_shielded_call_finishes_after_timing_out():
+    server, methods = make_server()
+    finished = []
+
+    @server.method("pg.restart", timeout=0.05, shield=True)
+    async def restart(payload, caller):
+        await asyncio.sleep(0.2)
+        finished.append(True)
+
+    async def run():
+        with pytest.raises(RpcError) as timed_out:
+            await call(methods, "pg.restart", "")
+        with pytest.raises(RpcError) as busy:
+            await call(methods, "pg.restart", "")
+        await asyncio.sleep(0.3)
+        return timed_out.value.code, busy.value.code, server.methods["pg.restart"].semaphore.locked()
+
+    assert asyncio.run(run()) == (TIMED_OUT, BUSY, False)
+    assert finished == [True]
+
+
+def test_offloaded_handler_runs_off_the_loop_and_is_cached():
+    server, methods = make_server()
+    threads = []
+
+    @server.method("pg.getStats", offload=True, cache_ttl=60, burst=10)
+    def get_stats(payload, caller):
+        threads.append(threading.current_thread())
+        time.sleep(0.01)
+        return {"calls": len(threads)}
+
+    async def run():
+        return [json.loads(await call(methods, "pg.getStats", "")) for _ in range(3)]
+
+    assert asyncio.run(run()) == [{"calls": 1}] * 3
+    assert threads and threads[0] is not threading.main_thread()
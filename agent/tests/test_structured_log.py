@@ -0,0 +1,127 @@
+import asyncio
+import json
+import logging
+
+import pytest
+
+import structured_log
+from structured_log import StructuredLogger, dump_on_error
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(json.loads(record.getMessage()))
+
+
+def make_logger(name, level=logging.INFO, **kwargs):
+    logger = logging.getLogger(f"test_structured_log.{name}")
+    logger.setLevel(level)
+    logger.propagate = False
+    handler = ListHandler()
+    logger.handlers = [handler]
+    return StructuredLogger(logger, **kwargs), handler
+
+
+def test_events_are_json_with_lazy_fields():
+    slog, handler = make_logger("json", sample_rates={})
+    slog.info("config_changed", room="room-1", config=lambda: {"voice": "Puck"}, count=3)
+
+    [record] = handler.records
+    assert record["event"] == "config_changed"
+    assert record["room"] == "room-1"
+    assert record["config"] == {"voice": "Puck"}
+    assert record["count"] == 3
+
+
+def test_lazy_fields_are_not_evaluated_when_filtered(monkeypatch):
+    monkeypatch.setattr(structured_log, "_shared_ring", None)
+    monkeypatch.delenv("LOG_RING_BUFFER_SIZE", raising=False)
+    calls = []
+    # The ring is off by default
+    slog, handler = make_logger("filtered", level=logging.WARNING, sample_rates={"noisy": 0.0})
+    slog.info("below_level", expensive=lambda: calls.append(1))
+    slog.warning("noisy", expensive=lambda: calls.append(1))
+    assert calls == []
+    assert handler.records == []
+
+
+def test_sampling_by_room_overrides_event_rate():
+    slog, handler = make_logger("sampling", sample_rates={"turn": 0.0, "vip-room": 1.0})
+    slog.info("turn", room="other-room")
+    slog.info("turn", room="vip-room")
+    assert [record["room"] for record in handler.records] == ["vip-room"]
+
+
+def test_ring_buffer_dump_replays_debug_events():
+    slog, handler = make_logger("ring", sample_rates={}, ring_size=3)
+    for i in range(5):
+        slog.debug("agent_turn", room="room-1", turn=i)
+    slog.debug("agent_turn", room="room-2", turn=99)
+    assert handler.records == []
+
+    assert slog.dump_recent("room-1", reason="boom") == 2
+    header, *replayed = handler.records
+    assert header["event"] == "ring_buffer_dump"
+    assert [record["turn"] for record in replayed] == [3, 4]
+    assert all(record["replayed"] for record in replayed)
+
+
+def test_ring_buffer_keeps_fields_as_they_were_at_event_time():
+    slog, handler = make_logger("ring_state", level=logging.WARNING, sample_rates={}, ring_size=8)
+    state = {"turns": 1}
+    slog.info("turn", room="room-1", turns=lambda: state["turns"])
+    state["turns"] = 2
+
+    slog.dump_recent("room-1")
+    assert handler.records[-1]["turns"] == 1
+
+
+def test_loggers_share_the_process_ring(monkeypatch):
+    monkeypatch.setattr(structured_log, "_shared_ring", None)
+    monkeypatch.setenv("LOG_RING_BUFFER_SIZE", "8")
+    session_log, handler = make_logger("shared_session", sample_rates={})
+    admission_log, _ = make_logger("shared_admission", level=logging.WARNING, sample_rates={})
+
+    admission_log.info("admitted", room="room-1", wait_ms=3)
+    assert session_log.dump_recent("room-1") == 1
+    assert handler.records[-1]["event"] == "admitted"
+    assert handler.records[-1]["logger"] == "test_structured_log.shared_admission"
+
+
+def test_dump_on_error_dumps_before_raising():
+    slog, handler = make_logger("dump_on_error", sample_rates={}, ring_size=8)
+
+    class Session:
+        room_name = "room-1"
+
+        @dump_on_error(slog)
+        async def fail(self):
+            slog.debug("about_to_fail", room=self.room_name)
+            raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(Session().fail())
+    assert [record["event"] for record in handler.records] == ["ring_buffer_dump", "about_to_fail"]
+
+
+def test_nested_dump_on_error_dumps_once():
+    slog, handler = make_logger("nested_dump", sample_rates={}, ring_size=8)
+
+    class Session:
+        room_name = "room-1"
+
+        @dump_on_error(slog)
+        async def outer(self):
+            await self.inner()
+
+        @dump_on_error(slog)
+        async def inner(self):
+            raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(Session().outer())
+    assert [record["event"] for record in handler.records] == ["ring_buffer_dump"]
@@ -0,0 +1,47 @@
+import sqlite3
+
+from transcripts import TranscriptSettings, TranscriptWriter
+
+
+def make_writer(tmp_path, **kwargs) -> TranscriptWriter:
+    settings = TranscriptSettings(db_path=str(tmp_path / "transcripts.sqlite3"), **kwargs)
+    return TranscriptWriter(settings)
+
+
+def read_rows(writer: TranscriptWriter):
+    with sqlite3.connect(writer.settings.db_path) as connection:
+        return connection.execute(
+            "SELECT room, participant_id, role, text FROM transcripts ORDER BY rowid"
+        ).fetchall()
+
+
+def test_transcripts_are_written_on_close(tmp_path):
+    writer = make_writer(tmp_path, batch_size=2, flush_interval=10.0)
+    writer.start()
+    assert writer.submit("room", "alice", "user", "Hello")
+    assert writer.submit("room", "alice", "assistant", "Hi there")
+    assert writer.submit("room", "alice", "user", "Tell me more")
+    writer.close()
+
+    assert read_rows(writer) == [
+        ("room", "alice", "user", "Hello"),
+        ("room", "alice", "assistant", "Hi there"),
+        ("room", "alice", "user", "Tell me more"),
+    ]
+    assert writer.stats()["written"] == 3
+
+
+def test_full_buffer_drops_instead_of_blocking(tmp_path):
+    writer = make_writer(tmp_path, queue_size=2)
+    assert writer.submit("room", "alice", "user", "one")
+    assert writer.submit("room", "alice", "user", "two")
+    assert not writer.submit("room", "alice", "user", "three")
+    assert writer.dropped_queue_full == 1
+
+
+def test_room_size_limit(tmp_path):
+    writer = make_writer(tmp_path, room_limit_bytes=10)
+    assert writer.submit("room-a", "alice", "user", "12345")
+    assert not writer.submit("room-a", "alice", "user", "123456")
+    assert writer.submit("room-b", "bob", "user", "123456")
+    assert writer.dropped_room_limit == 1
@@ -0,0 +1,76 @@
+import asyncio
+import os
+import pickle
+import signal
+from types import SimpleNamespace
+
+import pytest
+
+from worker_pool import _claim_cpu, prewarm
+
+DEAD_PID = 2**22 + 1  # above the default pid_max
+
+
+def test_cpu_claims_spread_live_processes_over_cores(tmp_path):
+    claims_file = str(tmp_path / "cpus")
+    cpus = [0, 1, 2]
+
+    assert [_claim_cpu(pid, cpus, claims_file) for pid in (os.getpid(), os.getppid(), 1)] == [0, 1, 2]
+    # Every core is taken once, so the next process doubles up on the first
+    assert _claim_cpu(DEAD_PID, cpus, claims_file) == 0
+
+
+def test_cpu_claims_of_exited_processes_are_released(tmp_path):
+    claims_file = str(tmp_path / "cpus")
+    cpus = [0, 1]
+
+    assert _claim_cpu(DEAD_PID, cpus, claims_file) == 0
+    assert _claim_cpu(os.getpid(), cpus, claims_file) == 0
+
+
+@pytest.fixture
+def worker_env(tmp_path, monkeypatch):
+    """Drain marker and CPU claims in a temporary directory, signals restored"""
+    pytest.importorskip("livekit.agents")
+    monkeypatch.setenv("AGENT_DRAIN_FILE", str(tmp_path / "agent.drain"))
+    monkeypatch.setenv("AGENT_CPU_CLAIMS_FILE", str(tmp_path / "agent.cpus"))
+    monkeypatch.setenv("AGENT_NUM_PROCESSES", "2")
+    previous = signal.getsignal(signal.SIGUSR1)
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    yield
+    asyncio.set_event_loop(None)
+    loop.close()
+    signal.signal(signal.SIGUSR1, previous)
+
+
+async def entrypoint(ctx):
+    pass
+
+
+def test_worker_options_build(worker_env):
+    from worker_pool import worker_options
+
+    opts = worker_options(entrypoint)
+    assert opts.entrypoint_fnc is entrypoint
+    assert opts.prewarm_fnc is prewarm
+    opts.validate_config(devmode=False)
+
+    from livekit.agents.worker import _WorkerEnvOption
+
+    assert _WorkerEnvOption.getvalue(opts.num_idle_processes, devmode=False) == 2
+    assert _WorkerEnvOption.getvalue(opts.load_threshold, devmode=False) == 1.0
+    # `dev` keeps LiveKit's development defaults
+    assert _WorkerEnvOption.getvalue(opts.num_idle_processes, devmode=True) == 0
+
+
+def test_worker_options_survive_pickling(worker_env):
+    from worker_pool import worker_options
+
+    opts = pickle.loads(pickle.dumps(worker_options(entrypoint)))
+    policy = opts.load_fnc.__self__
+    assert opts.request_fnc.__self__ is policy
+
+    worker = SimpleNamespace(active_jobs=[object()])
+    assert opts.load_fnc(worker) == 0.5
+    assert policy.admission.snapshot()["active"] == 1
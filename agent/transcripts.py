@@ -0,0 +1,189 @@
+"""
+Transcript Capture
+
+Opt-in pipeline that stores user and agent transcripts for later review
+without slowing down the audio path. Speech events only hand the text to a
+bounded in-memory buffer (never awaiting, never touching disk); a background
+thread writes the buffer to SQLite in batches. When the buffer or a room's
+size limit is full, transcripts are dropped and counted rather than applying
+backpressure to the conversation.
+
+Every job process runs its own writer, so with the worker pool several
+writers share the TRANSCRIPT_DB file. WAL mode lets them take turns; a batch
+waits up to 5 seconds for another process's write before the writer gives up.
+
+Settings are read from environment variables:
+    ENABLE_TRANSCRIPTION          - capture transcripts (default: false)
+    TRANSCRIPT_DB                 - SQLite file (default: transcripts.sqlite3)
+    TRANSCRIPT_QUEUE_SIZE         - transcripts buffered in memory (default: 1000)
+    TRANSCRIPT_BATCH_SIZE         - rows per write (default: 100)
+    TRANSCRIPT_FLUSH_INTERVAL     - seconds before a partial batch is written
+                                    (default: 1.0)
+    TRANSCRIPT_ROOM_LIMIT_BYTES   - text stored per room (default: 1048576)
+"""
+
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, List, Optional, Tuple
+
+from structured_log import StructuredLogger
+
+logger = logging.getLogger("transcripts")
+slog = StructuredLogger(logger)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS transcripts (
+    room TEXT NOT NULL,
+    participant_id TEXT NOT NULL,
+    role TEXT NOT NULL,
+    text TEXT NOT NULL,
+    created_at REAL NOT NULL
+)
+"""
+_INSERT = "INSERT INTO transcripts (room, participant_id, role, text, created_at) VALUES (?, ?, ?, ?, ?)"
+
+@dataclass
+class TranscriptSettings:
+    db_path: str = "transcripts.sqlite3"
+    queue_size: int = 1000
+    batch_size: int = 100
+    flush_interval: float = 1.0
+    room_limit_bytes: int = 1024 * 1024
+
+    @staticmethod
+    def enabled() -> bool:
+        return os.getenv("ENABLE_TRANSCRIPTION", "false").lower() == "true"
+
+    @classmethod
+    def from_env(cls) -> "TranscriptSettings":
+        return cls(
+            db_path=os.getenv("TRANSCRIPT_DB", "transcripts.sqlite3"),
+            queue_size=int(os.getenv("TRANSCRIPT_QUEUE_SIZE", "1000")),
+            batch_size=int(os.getenv("TRANSCRIPT_BATCH_SIZE", "100")),
+            flush_interval=float(os.getenv("TRANSCRIPT_FLUSH_INTERVAL", "1.0")),
+            room_limit_bytes=int(os.getenv("TRANSCRIPT_ROOM_LIMIT_BYTES", str(1024 * 1024))),
+        )
+
+
+class TranscriptWriter:
+    """Bounded buffer in front of a batched SQLite writer thread"""
+
+    def __init__(self, settings: TranscriptSettings):
+        self.settings = settings
+        # deque append/popleft are atomic, so submit() takes no lock and does
+        # not wake the writer for every transcript
+        self._buffer: Deque[Tuple] = deque()
+        self._wakeup = threading.Event()
+        self._closing = False
+        self._room_bytes: Dict[str, int] = {}
+        self._thread: Optional[threading.Thread] = None
+
+        self.submitted = 0
+        self.dropped_queue_full = 0
+        self.dropped_room_limit = 0
+        self.written = 0
+        self.batches = 0
+        self.write_seconds = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="transcript-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, room: str, participant_id: str, role: str, text: str) -> bool:
+        """Buffer a transcript without blocking; returns False if it was dropped"""
+        if not text:
+            return False
+
+        if len(self._buffer) >= self.settings.queue_size:
+            self.dropped_queue_full += 1
+            return False
+
+        size = len(text.encode("utf-8"))
+        used = self._room_bytes.get(room, 0)
+        if used + size > self.settings.room_limit_bytes:
+            self.dropped_room_limit += 1
+            return False
+
+        self._buffer.append((room, participant_id, role, text, time.time()))
+        self._room_bytes[room] = used + size
+        self.submitted += 1
+        if len(self._buffer) >= self.settings.batch_size:
+            self._wakeup.set()
+        return True
+
+    def close(self, timeout: float = 5.0):
+        """Flush what is buffered and stop the writer thread"""
+        if not self.running:
+            return
+        self._closing = True
+        self._wakeup.set()
+        self._thread.join(timeout=timeout)
+
+    async def aclose(self):
+        await asyncio.to_thread(self.close)
+
+    def _run(self):
+        connection = sqlite3.connect(self.settings.db_path, timeout=5.0)
+        try:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(_SCHEMA)
+            connection.commit()
+
+            while True:
+                self._wakeup.wait(self.settings.flush_interval)
+                self._wakeup.clear()
+                closing = self._closing
+                while self._buffer:
+                    batch: List[Tuple] = []
+                    while self._buffer and len(batch) < self.settings.batch_size:
+                        batch.append(self._buffer.popleft())
+                    self._write(connection, batch)
+                if closing:
+                    break
+        except Exception:
+            slog.exception("transcript_writer_stopped", db=self.settings.db_path, **self.stats())
+        finally:
+            connection.close()
+
+    def _write(self, connection: sqlite3.Connection, batch: List[Tuple]):
+        start = time.perf_counter()
+        with connection:
+            connection.executemany(_INSERT, batch)
+        self.write_seconds += time.perf_counter() - start
+        self.written += len(batch)
+        self.batches += 1
+
+    def stats(self) -> Dict:
+        return {
+            "submitted": self.submitted,
+            "written": self.written,
+            "batches": self.batches,
+            "queued": len(self._buffer),
+            "dropped_queue_full": self.dropped_queue_full,
+            "dropped_room_limit": self.dropped_room_limit,
+            "write_seconds": self.write_seconds,
+        }
+
+
+_transcript_writer: Optional[TranscriptWriter] = None
+
+
+def get_transcript_writer() -> Optional[TranscriptWriter]:
+    """Return the process-wide writer, or None when transcription is disabled"""
+    global _transcript_writer
+    if not TranscriptSettings.enabled():
+        return None
+    if _transcript_writer is None or not _transcript_writer.running:
+        _transcript_writer = TranscriptWriter(TranscriptSettings.from_env())
+        _transcript_writer.start()
+    return _transcript_writer
@@ -0,0 +1,231 @@
+"""
+Worker Pool Configuration
+
+Production run mode for multi-core hosts. The LiveKit worker acts as the
+supervisor: it keeps a pool of warm job processes, each room runs in its own
+process (and therefore its own GIL), and the reported load lets the server
+spread rooms across workers. LiveKit starts job processes with "spawn", so
+they share no memory with the worker; each one imports the agent and builds
+its own prompt cache. `dev` keeps LiveKit's development defaults: no warm
+processes and no load threshold.
+
+Settings are read from environment variables:
+    AGENT_NUM_PROCESSES   - warm job processes kept ready (default: CPU count)
+    AGENT_MAX_JOBS        - rooms accepted before the worker reports full
+                            (default: AGENT_NUM_PROCESSES)
+    AGENT_PIN_CPUS        - pin each job process to a single core (default: true)
+    AGENT_CPU_CLAIMS_FILE - which job process is pinned to which core
+                            (default: /tmp/gemini-agent.cpus)
+"""
+
+import asyncio
+import json
+import logging
+import math
+import os
+import signal
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from structured_log import StructuredLogger
+
+logger = logging.getLogger("worker_pool")
+slog = StructuredLogger(logger)
+
+
+def _available_cpus() -> List[int]:
+    """Cores this process is allowed to run on"""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+@dataclass
+class PoolSettings:
+    num_processes: int
+    max_jobs: int
+    pin_cpus: bool
+    cpu_claims_file: str = "/tmp/gemini-agent.cpus"
+
+    @classmethod
+    def from_env(cls) -> "PoolSettings":
+        cpus = len(_available_cpus())
+        num_processes = int(os.getenv("AGENT_NUM_PROCESSES", str(cpus)))
+        return cls(
+            num_processes=max(1, num_processes),
+            max_jobs=max(1, int(os.getenv("AGENT_MAX_JOBS", str(num_processes)))),
+            pin_cpus=os.getenv("AGENT_PIN_CPUS", "true").lower() == "true",
+            cpu_claims_file=os.getenv("AGENT_CPU_CLAIMS_FILE", "/tmp/gemini-agent.cpus"),
+        )
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _claim_cpu(pid: int, cpus: List[int], claims_file: str) -> int:
+    """Pick the core with the fewest live pinned processes and record the claim.
+
+    Job processes are started independently, so the claims live in a file
+    shared by all of them, updated under an exclusive lock. Claims of
+    processes that have exited are dropped.
+    """
+    import fcntl
+
+    with open(claims_file, "a+") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        f.seek(0)
+        try:
+            claims: Dict[int, int] = {int(p): cpu for p, cpu in json.loads(f.read() or "{}").items()}
+        except (ValueError, AttributeError):
+            claims = {}
+        claims = {p: cpu for p, cpu in claims.items() if cpu in cpus and p != pid and _alive(p)}
+        in_use = Counter(claims.values())
+        cpu = min(cpus, key=lambda c: (in_use[c], c))
+        claims[pid] = cpu
+        f.seek(0)
+        f.truncate()
+        json.dump(claims, f)
+    return cpu
+
+
+def clear_cpu_claims(claims_file: str):
+    """Forget claims from a previous run, whose PIDs may have been reused"""
+    try:
+        os.remove(claims_file)
+    except FileNotFoundError:
+        pass
+
+
+def pin_to_cpu(pid: Optional[int] = None, claims_file: Optional[str] = None) -> Optional[int]:
+    """Pin a job process to the least used core"""
+    if not hasattr(os, "sched_setaffinity"):
+        return None
+
+    pid = pid or os.getpid()
+    claims_file = claims_file or PoolSettings.from_env().cpu_claims_file
+    try:
+        cpu = _claim_cpu(pid, _available_cpus(), claims_file)
+    except OSError as e:
+        slog.warning("cpu_claim_failed", pid=pid, error=str(e))
+        return None
+    try:
+        os.sched_setaffinity(pid, {cpu})
+    except OSError as e:
+        slog.warning("cpu_pin_failed", pid=pid, cpu=cpu, error=str(e))
+        return None
+    return cpu
+
+
+def prewarm(proc) -> None:
+    """Prewarm hook run once in every job process before it takes a room"""
+    settings = PoolSettings.from_env()
+    if settings.pin_cpus:
+        cpu = pin_to_cpu(claims_file=settings.cpu_claims_file)
+        proc.userdata["cpu"] = cpu
+        slog.info("cpu_pinned", pid=os.getpid(), cpu=cpu)
+
+
+def compute_load(worker, max_jobs: int) -> float:
+    """Report load as the fraction of job slots in use"""
+    return min(len(worker.active_jobs) / max_jobs, 1.0)
+
+
+class WorkerPolicy:
+    """load_fnc and request_fnc of the worker: admission control and draining.
+
+    LiveKit pickles WorkerOptions when it hands them to another process (the
+    dev watcher does), so only the settings are pickled; the admission queue
+    and drain state are rebuilt in the process that unpickles them.
+    """
+
+    def __init__(self, max_jobs: int, admission_settings, memory_settings, drain_settings):
+        self.max_jobs = max_jobs
+        self.admission_settings = admission_settings
+        self.memory_settings = memory_settings
+        self.drain_settings = drain_settings
+        self._build()
+
+    def _build(self):
+        from admission import AdmissionController
+        from drain import WorkerDrain
+
+        self.admission = AdmissionController(
+            self.admission_settings, memory_check=self.memory_settings.has_headroom
+        )
+        self.drain = WorkerDrain(self.drain_settings)
+
+    def __getstate__(self) -> Dict:
+        state = self.__dict__.copy()
+        del state["admission"], state["drain"]
+        return state
+
+    def __setstate__(self, state: Dict):
+        self.__dict__.update(state)
+        self._build()
+
+    def load(self, worker) -> float:
+        active = len(worker.active_jobs)
+        self.admission.update_active(active)
+        self.drain.update(active)
+        # Reporting full keeps the server from sending jobs while draining
+        return 1.0 if self.drain.draining else compute_load(worker, self.max_jobs)
+
+    async def request(self, req):
+        if self.drain.draining:
+            self.drain.refused += 1
+            await req.reject()
+            return
+        await self.admission.request_fnc(req)
+
+
+def worker_options(entrypoint_fnc, **kwargs):
+    """Build WorkerOptions; the pool settings apply in `start` mode only"""
+    from livekit.agents import WorkerOptions, WorkerType
+    from livekit.agents.worker import _WorkerEnvOption
+
+    from admission import AdmissionSettings
+    from drain import DrainSettings, clear_drain, drain_on_sigterm, request_drain
+    from memory_budget import MemorySettings
+
+    settings = PoolSettings.from_env()
+    drain_settings = DrainSettings.from_env()
+    policy = WorkerPolicy(
+        settings.max_jobs,
+        AdmissionSettings.from_env(settings.max_jobs),
+        MemorySettings.from_env(),
+        drain_settings,
+    )
+    slog.info(
+        "worker_pool",
+        processes=settings.num_processes,
+        max_jobs=settings.max_jobs,
+        pin_cpus=settings.pin_cpus,
+    )
+
+    clear_cpu_claims(settings.cpu_claims_file)
+
+    # A marker left by the previous run of this container is stale
+    clear_drain(drain_settings)
+    signal.signal(signal.SIGUSR1, lambda signum, frame: request_drain(drain_settings, "SIGUSR1"))
+    # The CLI installs its SIGTERM handler just before it starts the loop
+    asyncio.get_event_loop().call_soon(drain_on_sigterm, drain_settings)
+
+    return WorkerOptions(
+        entrypoint_fnc=entrypoint_fnc,
+        request_fnc=policy.request,
+        prewarm_fnc=prewarm,
+        load_fnc=policy.load,
+        # Full only at max_jobs; see admission.py for when rooms are queued
+        load_threshold=_WorkerEnvOption(dev_default=math.inf, prod_default=1.0),
+        num_idle_processes=_WorkerEnvOption(dev_default=0, prod_default=settings.num_processes),
+        worker_type=WorkerType.ROOM,
+        **kwargs,
+    )
@@ -2,8 +2,27 @@
 
 # Script to rebuild and run the Gemini Agent Docker container
 
+DRAIN_TIMEOUT=${AGENT_DRAIN_TIMEOUT:-120}
+DRAIN_FILE=${AGENT_DRAIN_FILE:-/tmp/gemini-agent.drain}
+
+if [ -n "$(docker compose ps -q --status running gemini-agent)" ]; then
+    # Wait as long as the running worker was told to (its --drain-timeout)
+    DRAIN_TIMEOUT=$(docker compose exec -T gemini-agent sh -c 'echo "${AGENT_DRAIN_TIMEOUT:-120}"')
+    echo "🚰 Draining active sessions (up to ${DRAIN_TIMEOUT}s)..."
+    docker compose exec -T gemini-agent rm -f "$DRAIN_FILE.done"
+    docker compose kill -s SIGUSR1 gemini-agent
+    for _ in $(seq "$DRAIN_TIMEOUT"); do
+        if docker compose exec -T gemini-agent test -f "$DRAIN_FILE.done" 2>/dev/null; then
+            echo "✅ Drain complete: $(docker compose exec -T gemini-agent cat "$DRAIN_FILE.done")"
+            break
+        fi
+        sleep 1
+    done
+fi
+
 echo "🐳 Stopping and removing existing containers..."
-docker compose down --remove-orphans
+# Leave LiveKit's own drain (--drain-timeout) time to finish after SIGTERM
+docker compose down --remove-orphans --timeout "$((DRAIN_TIMEOUT + 30))"
 
 echo "🧹 Cleaning up Docker images..."
 docker image prune -f